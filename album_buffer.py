@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+相册缓冲模块
+将同一键（相册的 media_group_id、批量模式下的聊天ID）的多条消息在短时间窗口内聚合，
+窗口结束或达到数量上限后一次性交给回调处理
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Set
+from loguru import logger
+
+
+class AlbumBuffer:
+    """相册消息缓冲区（防抖：每收到一条新消息都会重新计时）"""
+
+    def __init__(
+        self,
+        window: float,
+        on_flush: Callable[[str, List[Any]], Awaitable[None]],
+        max_items: int = 0
+    ):
+        """
+        初始化相册缓冲区
+
+        Args:
+            window: 聚合窗口（秒），最后一条消息到达后等待这么久再处理
+            on_flush: 处理一组相册消息的协程函数，参数为 (media_group_id, items)
+            max_items: 单组最大数量，达到后立即处理，0 表示不限制
+        """
+        self.window = window
+        self.max_items = max_items
+        self._on_flush = on_flush
+        self._albums: Dict[str, List[Any]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def pending(self) -> int:
+        """等待聚合的相册数量"""
+        return len(self._albums)
+
+    def add(self, media_group_id: str, item: Any) -> None:
+        """
+        加入一条相册消息
+
+        Args:
+            media_group_id: 相册ID
+            item: 相册中的一项
+        """
+        items = self._albums.setdefault(media_group_id, [])
+        items.append(item)
+
+        timer = self._timers.pop(media_group_id, None)
+        if timer is not None:
+            timer.cancel()
+
+        if self.max_items and len(items) >= self.max_items:
+            self._schedule_flush(media_group_id)
+            return
+
+        loop = asyncio.get_running_loop()
+        self._timers[media_group_id] = loop.call_later(self.window, self._schedule_flush, media_group_id)
+
+    def _schedule_flush(self, media_group_id: str) -> None:
+        """窗口结束，创建处理任务"""
+        self._timers.pop(media_group_id, None)
+        items = self._albums.pop(media_group_id, None)
+        if not items:
+            return
+
+        task = asyncio.create_task(self._flush(media_group_id, items))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self, media_group_id: str, items: List[Any]) -> None:
+        """调用回调处理相册"""
+        try:
+            await self._on_flush(media_group_id, items)
+        except Exception as e:
+            logger.error(f"处理相册 {media_group_id} 失败: {str(e)}")
+
+    async def flush_all(self) -> None:
+        """立即处理所有等待中的相册（关闭时使用）"""
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+
+        albums, self._albums = self._albums, {}
+        for media_group_id, items in albums.items():
+            await self._flush(media_group_id, items)
+
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线吞吐量压测
+启动本地模拟的 Bot API 服务器（fake_bot_api.py），通过 start_ultra_stable.main 启动真实的 Application，
+按目标速率模拟用户上传文件，输出吞吐量、处理器/转发延迟分位数和每个文件的 API 调用次数
+
+用法:
+    python benchmark.py --files 500 --rate 50 --latency 0.05
+    python benchmark.py --json result.json   # 保存结果，便于与上一次比较
+
+机器人的其他配置（FORWARD_WORKERS、CONCURRENT_UPDATES 等）照常通过环境变量设置
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import signal
+import asyncio
+import argparse
+import tempfile
+import threading
+from typing import Awaitable, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_bot_api import FakeBotAPI
+
+BENCH_TOKEN = '123456:BENCHMARK'
+TARGET_GROUP_ID = '-1009999999999'
+
+# 不限速时使用的速率（真实的 Telegram 限制会让压测只测到限流器）
+UNLIMITED_RATE = '1000000'
+
+
+def percentile(values: List[float], p: float) -> float:
+    """最近秩法分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="离线吞吐量压测")
+    parser.add_argument('--files', type=int, default=500, help="上传的文件数")
+    parser.add_argument('--rate', type=float, default=50, help="目标上传速率（文件/秒）")
+    parser.add_argument('--latency', type=float, default=0.02, help="模拟 Bot API 的响应延迟（秒）")
+    parser.add_argument('--chats', type=int, default=10, help="上传文件的用户数")
+    parser.add_argument('--file-types', default='document,photo,video,audio,voice', help="轮流使用的文件类型")
+    parser.add_argument('--timeout', type=float, default=120, help="等待全部转发完成的最长时间（秒）")
+    parser.add_argument('--idle-timeout', type=float, default=10, help="上传结束后超过此时间没有新的转发则停止（秒）")
+    parser.add_argument('--real-rate-limits', action='store_true', help="使用机器人配置的限速（默认不限速）")
+    parser.add_argument('--verbose', action='store_true', help="保留机器人的日志输出")
+    parser.add_argument('--json', metavar='PATH', help="将结果写入 JSON 文件")
+    return parser.parse_args()
+
+
+def configure_environment(args, api: FakeBotAPI, workdir: str) -> None:
+    """在导入机器人模块之前设置配置（Config 在导入时读取环境变量）"""
+    os.environ.update({
+        'BOT_TOKEN': BENCH_TOKEN,
+        'TARGET_GROUP_ID': TARGET_GROUP_ID,
+        'BOT_API_BASE_URL': api.base_url,
+        'ALLOWED_USERS': '',
+        'OUTBOX_PATH': os.path.join(workdir, 'outbox.db'),
+        'DEDUP_PATH': os.path.join(workdir, 'dedup.db'),
+        'TOPICS_PATH': os.path.join(workdir, 'topics.json'),
+        'ROUTING_CONFIG_PATH': os.path.join(workdir, 'bot_config.json'),
+        'HEALTH_ENABLED': 'false',
+        'METRICS_ENABLED': 'false'
+    })
+    if not args.real_rate_limits:
+        for name in ('RATE_LIMIT_GLOBAL_PER_SECOND', 'RATE_LIMIT_GROUP_PER_MINUTE', 'RATE_LIMIT_PRIVATE_PER_SECOND'):
+            os.environ[name] = UNLIMITED_RATE
+
+
+async def wait_until_polling(api: FakeBotAPI) -> None:
+    """等待机器人开始轮询"""
+    while not api.calls['getUpdates']:
+        await asyncio.sleep(0.05)
+
+
+async def upload_files(args, api: FakeBotAPI, count: int, start_index: int = 0) -> None:
+    """按 args.rate 的速率上传 count 个文件（按计划时间上传，不因处理变慢而降低上传速率）"""
+    file_types = args.file_types.split(',')
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    for offset in range(count):
+        delay = started + offset / args.rate - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        index = start_index + offset
+        chat_id = 1000 + index % args.chats
+        api.upload(chat_id, file_types[index % len(file_types)], f"bench-{index}", file_size=1024 * (index + 1))
+
+
+async def wait_for_forwards(api: FakeBotAPI, total: int, timeout: float, idle_timeout: float) -> bool:
+    """等待 total 个文件全部转发，超时或转发停滞超过 idle_timeout 时返回 False（队列满时被拒绝的文件不会被转发）"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    forwarded, idle_since = len(api.forwarded), loop.time()
+    while forwarded < total and loop.time() < deadline and loop.time() - idle_since < idle_timeout:
+        await asyncio.sleep(0.05)
+        if len(api.forwarded) != forwarded:
+            forwarded, idle_since = len(api.forwarded), loop.time()
+    return forwarded >= total
+
+
+async def produce_uploads(args, api: FakeBotAPI, result: Dict) -> None:
+    """等机器人开始轮询后按目标速率上传文件，全部转发完成（或停滞）后停止机器人"""
+    await wait_until_polling(api)
+    await upload_files(args, api, args.files)
+    result['timed_out'] = not await wait_for_forwards(api, args.files, args.timeout, args.idle_timeout)
+    os.kill(os.getpid(), signal.SIGINT)
+
+
+def run_fake_api(api: FakeBotAPI, ready: threading.Event, driver: Callable[[], Awaitable[None]]):
+    """在后台线程中运行模拟服务器和驱动协程（驱动协程结束时应发送 SIGINT 停止机器人）"""
+    loop = asyncio.new_event_loop()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(api.start())
+        ready.set()
+        loop.create_task(driver())
+        loop.run_forever()
+        loop.run_until_complete(api.stop())
+        loop.close()
+
+    thread = threading.Thread(target=run, name='fake-bot-api', daemon=True)
+    thread.start()
+    return loop, thread
+
+
+def build_report(args, api: FakeBotAPI, handler_latencies: List[float], timed_out: bool) -> Dict:
+    """汇总压测结果"""
+    forward_latencies = [
+        times[0] - api.delivered[file_id]
+        for file_id, times in api.forwarded.items() if file_id in api.delivered
+    ]
+    first_delivered = min(api.delivered.values(), default=0.0)
+    last_forwarded = max((times[0] for times in api.forwarded.values()), default=first_delivered)
+    elapsed = max(last_forwarded - first_delivered, 1e-9)
+    api_calls = {method: count for method, count in api.calls.items() if method != 'getUpdates'}
+    forwarded = len(api.forwarded)
+
+    return {
+        'files': args.files,
+        'forwarded': forwarded,
+        'duplicates': sum(len(times) - 1 for times in api.forwarded.values()),
+        'timed_out': timed_out,
+        'rate': args.rate,
+        'latency': args.latency,
+        'elapsed': round(elapsed, 3),
+        'files_per_second': round(forwarded / elapsed, 2),
+        'handler_ms': {f'p{p}': round(percentile(handler_latencies, p) * 1000, 2) for p in (50, 95, 99)},
+        'forward_ms': {f'p{p}': round(percentile(forward_latencies, p) * 1000, 2) for p in (50, 95, 99)},
+        'api_calls_per_file': round(sum(api_calls.values()) / max(forwarded, 1), 2),
+        'api_calls': api_calls,
+        'get_updates_calls': api.calls['getUpdates']
+    }
+
+
+def print_report(report: Dict) -> None:
+    print("")
+    print("压测结果")
+    print("=" * 50)
+    print(f"转发文件: {report['forwarded']}/{report['files']}{'（未全部完成）' if report['timed_out'] else ''}")
+    print(f"重复转发: {report['duplicates']}")
+    print(f"耗时: {report['elapsed']} 秒")
+    print(f"吞吐量: {report['files_per_second']} 文件/秒（目标 {report['rate']}）")
+    print("处理器延迟 (ms): " + " / ".join(f"{k}={v}" for k, v in report['handler_ms'].items()))
+    print("转发延迟 (ms): " + " / ".join(f"{k}={v}" for k, v in report['forward_ms'].items()))
+    print(f"每个文件的 API 调用: {report['api_calls_per_file']}")
+    for method, count in sorted(report['api_calls'].items()):
+        print(f"  {method}: {count}")
+    print(f"getUpdates 调用: {report['get_updates_calls']}")
+    print("=" * 50)
+
+
+def run_bot(args, api: FakeBotAPI, driver: Callable[[], Awaitable[None]]) -> List[float]:
+    """
+    在后台线程运行模拟服务器和驱动协程，在主线程通过 start_ultra_stable.main 运行机器人，直到收到 SIGINT
+
+    Returns:
+        List[float]: 每个上传在处理器中的耗时（秒）
+    """
+    workdir = tempfile.mkdtemp(prefix='tg-bench-')
+    # 机器人会在当前目录写日志
+    os.chdir(workdir)
+
+    ready = threading.Event()
+    loop, thread = run_fake_api(api, ready, driver)
+    ready.wait()
+    configure_environment(args, api, workdir)
+
+    import start_ultra_stable as bot
+    from loguru import logger
+    if not args.verbose:
+        logger.remove()
+        logger.add(sys.stderr, level='WARNING')
+
+    # 记录每个上传在处理器中的耗时
+    handler_latencies: List[float] = []
+    handle_file_upload = bot.handle_file_upload
+
+    async def timed_handle_file_upload(update, context, file_type):
+        started = time.perf_counter()
+        try:
+            await handle_file_upload(update, context, file_type)
+        finally:
+            handler_latencies.append(time.perf_counter() - started)
+
+    bot.handle_file_upload = timed_handle_file_upload
+
+    bot.main()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    return handler_latencies
+
+
+def main():
+    args = parse_args()
+    json_path = os.path.abspath(args.json) if args.json else None
+    api = FakeBotAPI(BENCH_TOKEN, latency=args.latency)
+    result = {'timed_out': True}
+    handler_latencies = run_bot(args, api, lambda: produce_uploads(args, api, result))
+
+    report = build_report(args, api, handler_latencies, result['timed_out'])
+    print_report(report)
+    if json_path:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    sys.exit(1 if report['timed_out'] else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+故障注入测试
+在本地模拟的 Bot API 服务器上按脚本注入故障（429 限流、超时、连接重置、getUpdates 冲突、慢响应、502），
+运行真实的机器人，统计恢复时间、浪费的重试调用、重复发送和未转发的文件
+
+用法:
+    python chaos.py --list                 # 查看内置场景
+    python chaos.py --scenario flap        # 运行内置场景
+    python chaos.py --script faults.json   # 运行自定义脚本
+
+脚本格式（时间均相对于开始上传的时刻，单位秒）:
+    {"duration": 30, "faults": [
+        {"fault": "reset", "start": 5, "duration": 10, "methods": "send", "probability": 0.5},
+        {"fault": "flood", "start": 20, "duration": 5, "retry_after": 3}
+    ]}
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import signal
+import asyncio
+import argparse
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_bot_api import FakeBotAPI, SEND_FILE_METHODS
+from benchmark import BENCH_TOKEN, percentile, run_bot, upload_files, wait_for_forwards, wait_until_polling
+
+# 故障类型
+FAULT_KINDS = ('flood', 'timeout', 'reset', 'conflict', 'slow', 'bad_gateway')
+
+# 请求延迟后仍被服务器处理的故障类型
+DELAY_FAULTS = ('timeout', 'slow')
+
+# 接口分组
+METHOD_GROUPS = {
+    'send': set(SEND_FILE_METHODS) | {'sendMediaGroup', 'copyMessages'},
+    'reply': {'sendMessage', 'editMessageText'},
+    'poll': {'getUpdates'}
+}
+
+# 故障测试中的发送读取超时（秒），timeout 故障的延迟超过它时机器人收到 TimedOut
+CHAOS_SEND_READ_TIMEOUT = '2'
+
+
+@dataclass
+class FaultRule:
+    """一条故障规则：在 [start, start + duration) 时间段内对匹配的接口注入故障"""
+
+    fault: str
+    start: float
+    duration: float
+    methods: str = 'send'       # 接口分组（send/reply/poll）、* 或逗号分隔的接口名
+    probability: float = 1.0    # 每个请求注入故障的概率
+    retry_after: int = 3        # flood: 429 响应中的 retry_after
+    delay: float = 3.0          # timeout/slow: 响应前的等待时间
+    method_names: set = field(default_factory=set, repr=False)
+
+    def __post_init__(self):
+        if self.fault not in FAULT_KINDS:
+            raise ValueError(f"未知的故障类型: {self.fault}")
+        if self.methods != '*':
+            for name in self.methods.split(','):
+                name = name.strip()
+                self.method_names |= METHOD_GROUPS.get(name, {name})
+
+    @property
+    def end(self) -> float:
+        return self.start + self.duration
+
+    def matches(self, method: str, elapsed: float) -> bool:
+        if not self.start <= elapsed < self.end:
+            return False
+        return self.methods == '*' or method in self.method_names
+
+
+@dataclass
+class Scenario:
+    """故障场景"""
+
+    description: str
+    faults: List[FaultRule]
+    duration: float = 30.0      # 上传持续时间（秒）
+
+    @property
+    def fault_end(self) -> float:
+        return max((rule.end for rule in self.faults), default=0.0)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Scenario':
+        return cls(
+            description=data.get('description', '自定义脚本'),
+            faults=[FaultRule(**rule) for rule in data.get('faults', [])],
+            duration=float(data.get('duration', 30))
+        )
+
+
+SCENARIOS = {
+    'flap': Scenario("网络抖动：10 秒内发送请求的连接被重置", [FaultRule('reset', 5, 10)]),
+    'flaky': Scenario("不稳定网络：20 秒内 30% 的请求连接被重置", [FaultRule('reset', 5, 20, '*', probability=0.3)]),
+    'flood': Scenario("限流：10 秒内发送请求返回 429（retry_after=3）", [FaultRule('flood', 5, 10, retry_after=3)]),
+    'timeouts': Scenario(
+        "超时：10 秒内发送请求在读取超时之后才响应（服务器已处理，可能重复发送）",
+        [FaultRule('timeout', 5, 10, delay=3.0)]
+    ),
+    'conflict': Scenario("冲突：10 秒内 getUpdates 返回 409", [FaultRule('conflict', 5, 10, 'poll')]),
+    'slow': Scenario("慢响应：10 秒内所有请求延迟 1 秒", [FaultRule('slow', 5, 10, '*', delay=1.0)]),
+    'outage': Scenario("服务中断：15 秒内所有请求返回 502", [FaultRule('bad_gateway', 5, 15, '*')]),
+    'mixed': Scenario(
+        "混合故障：连接重置、限流和慢响应交替出现",
+        [
+            FaultRule('reset', 5, 10, probability=0.5),
+            FaultRule('flood', 15, 5, retry_after=2),
+            FaultRule('slow', 20, 10, '*', delay=0.5)
+        ],
+        duration=40.0
+    )
+}
+
+
+class ChaosBotAPI(FakeBotAPI):
+    """按故障规则注入故障的模拟 Bot API"""
+
+    def __init__(self, token: str, scenario: Scenario, latency: float = 0.0, seed: int = 0):
+        super().__init__(token, latency=latency)
+        self.scenario = scenario
+        self.started: Optional[float] = None    # 开始上传的时间，之前不注入故障
+        self.injected: Counter = Counter()      # 故障类型 -> 注入次数
+        self.rejected_calls: Counter = Counter()  # 接口 -> 未被处理的请求数（timeout/slow 之外的故障）
+        self.delayed = 0                        # 正在等待的 timeout/slow 请求数
+        self._random = random.Random(seed)
+
+    async def inject_fault(self, method: str, params: Dict[str, Any]) -> Optional[Tuple[Optional[int], Dict[str, Any]]]:
+        if self.started is None:
+            return None
+        elapsed = time.monotonic() - self.started
+        for rule in self.scenario.faults:
+            if rule.matches(method, elapsed) and self._random.random() < rule.probability:
+                self.injected[rule.fault] += 1
+                if rule.fault not in DELAY_FAULTS:
+                    self.rejected_calls[method] += 1
+                return await self._apply(rule)
+        return None
+
+    async def _apply(self, rule: FaultRule) -> Optional[Tuple[Optional[int], Dict[str, Any]]]:
+        if rule.fault == 'flood':
+            return 429, {
+                'ok': False, 'error_code': 429,
+                'description': f"Too Many Requests: retry after {rule.retry_after}",
+                'parameters': {'retry_after': rule.retry_after}
+            }
+        if rule.fault == 'conflict':
+            return 409, {
+                'ok': False, 'error_code': 409,
+                'description': "Conflict: terminated by other getUpdates request; "
+                               "make sure that only one bot instance is running"
+            }
+        if rule.fault == 'bad_gateway':
+            return 502, {'ok': False, 'error_code': 502, 'description': 'Bad Gateway'}
+        if rule.fault == 'reset':
+            return None, {}
+        # timeout/slow：等待后照常处理（客户端可能已经超时放弃，服务器仍然发送了消息）
+        self.delayed += 1
+        try:
+            await asyncio.sleep(rule.delay)
+        finally:
+            self.delayed -= 1
+        return None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="故障注入测试")
+    parser.add_argument('--scenario', default='flap', choices=sorted(SCENARIOS), help="内置场景")
+    parser.add_argument('--script', metavar='PATH', help="自定义故障脚本（JSON），优先于 --scenario")
+    parser.add_argument('--list', action='store_true', help="列出内置场景")
+    parser.add_argument('--rate', type=float, default=5, help="上传速率（文件/秒）")
+    parser.add_argument('--latency', type=float, default=0.02, help="正常情况下的响应延迟（秒）")
+    parser.add_argument('--chats', type=int, default=5, help="上传文件的用户数")
+    parser.add_argument('--file-types', default='document,photo,video,audio,voice', help="轮流使用的文件类型")
+    parser.add_argument('--seed', type=int, default=0, help="随机故障的种子")
+    parser.add_argument('--timeout', type=float, default=180, help="上传结束后等待全部转发的最长时间（秒）")
+    parser.add_argument('--idle-timeout', type=float, default=90, help="上传结束后超过此时间没有新的转发则停止（秒）")
+    parser.add_argument('--real-rate-limits', action='store_true', help="使用机器人配置的限速（默认不限速）")
+    parser.add_argument('--verbose', action='store_true', help="保留机器人的日志输出")
+    parser.add_argument('--json', metavar='PATH', help="将结果写入 JSON 文件")
+    return parser.parse_args()
+
+
+async def run_scenario(args, api: ChaosBotAPI, result: Dict) -> None:
+    """上传文件并在故障结束后测量恢复时间，全部转发（或停滞）后停止机器人"""
+    await wait_until_polling(api)
+    scenario = api.scenario
+    total = int(scenario.duration * args.rate)
+    api.started = time.monotonic()
+    uploads = asyncio.create_task(upload_files(args, api, total))
+
+    # 恢复时间：故障结束后，故障结束前上传的文件全部转发完成所需的时间
+    fault_end = api.started + scenario.fault_end
+    await asyncio.sleep(max(0.0, fault_end - time.monotonic()))
+    backlog = [file_id for file_id, uploaded_at in api.uploaded.items() if uploaded_at <= fault_end]
+    deadline = fault_end + args.timeout
+    while time.monotonic() < deadline and not all(file_id in api.forwarded for file_id in backlog):
+        await asyncio.sleep(0.05)
+    if all(file_id in api.forwarded for file_id in backlog):
+        result['recovery'] = round(time.monotonic() - fault_end, 3)
+
+    await uploads
+    await wait_for_forwards(api, total, args.timeout, args.idle_timeout)
+    # 等待仍在延迟中的请求完成，它们造成的重复发送也要计入
+    while api.delayed:
+        await asyncio.sleep(0.05)
+    result['total'] = total
+    os.kill(os.getpid(), signal.SIGINT)
+
+
+def build_report(name: str, api: ChaosBotAPI, result: Dict) -> Dict:
+    scenario = api.scenario
+    total = result.get('total', len(api.uploaded))
+    rejected_sends = sum(count for method, count in api.rejected_calls.items() if method in METHOD_GROUPS['send'])
+    duplicates = sum(len(times) - 1 for times in api.forwarded.values())
+    forward_latencies = [
+        times[0] - api.uploaded[file_id] for file_id, times in api.forwarded.items() if file_id in api.uploaded
+    ]
+    send_calls = sum(count for method, count in api.calls.items() if method in METHOD_GROUPS['send'])
+
+    return {
+        'scenario': name,
+        'description': scenario.description,
+        'files': total,
+        'forwarded': len(api.forwarded),
+        'lost': total - len(api.forwarded),
+        'duplicates': duplicates,
+        'recovery_seconds': result.get('recovery'),
+        'injected': dict(api.injected),
+        'send_calls': send_calls,
+        # 被拒绝或断开的发送请求 + 服务器已处理但客户端超时重试造成的重复发送
+        'wasted_send_calls': rejected_sends + duplicates,
+        'forward_ms': {f'p{p}': round(percentile(forward_latencies, p) * 1000, 1) for p in (50, 95, 99)},
+        'api_calls': dict(api.calls)
+    }
+
+
+def print_report(report: Dict) -> None:
+    recovery = report['recovery_seconds']
+    print("")
+    print(f"故障测试结果: {report['scenario']}")
+    print("=" * 50)
+    print(f"场景: {report['description']}")
+    print(f"上传文件: {report['files']}")
+    print(f"已转发: {report['forwarded']}")
+    print(f"未转发: {report['lost']}")
+    print(f"重复发送: {report['duplicates']}")
+    print(f"恢复时间: {f'{recovery} 秒' if recovery is not None else '未恢复'}")
+    print("注入故障: " + (", ".join(f"{kind}={count}" for kind, count in report['injected'].items()) or "无"))
+    print(f"发送请求: {report['send_calls']}（浪费 {report['wasted_send_calls']}）")
+    print("转发延迟 (ms): " + " / ".join(f"{k}={v}" for k, v in report['forward_ms'].items()))
+    print("=" * 50)
+
+
+def main():
+    args = parse_args()
+    if args.list:
+        for name, scenario in sorted(SCENARIOS.items()):
+            print(f"{name:<10} {scenario.description}")
+        return
+
+    if args.script:
+        with open(args.script, 'r', encoding='utf-8') as f:
+            scenario = Scenario.from_dict(json.load(f))
+        name = os.path.basename(args.script)
+    else:
+        scenario = SCENARIOS[args.scenario]
+        name = args.scenario
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    os.environ.setdefault('SEND_READ_TIMEOUT', CHAOS_SEND_READ_TIMEOUT)
+    api = ChaosBotAPI(BENCH_TOKEN, scenario, latency=args.latency, seed=args.seed)
+    result: Dict = {}
+    run_bot(args, api, lambda: run_scenario(args, api, result))
+
+    report = build_report(name, api, result)
+    print_report(report)
+    if json_path:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    sys.exit(1 if report['lost'] else 0)
+
+
+if __name__ == '__main__':
+    main()
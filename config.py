@@ -16,16 +16,112 @@ class Config:
     # 话题ID (可选，如果群组开启话题模式)
     TOPIC_ID = os.getenv('TOPIC_ID', '3')  # 话题ID，如果为空则不使用话题模式
     
+    # 额外转发目标 (可选，逗号分隔的 [名称=]群组ID[:话题ID]，文件会同时转发到主群组和这些目标)
+    EXTRA_DESTINATIONS = os.getenv('EXTRA_DESTINATIONS', '')
+    
+    # 路由规则 (读取配置文件中的 ROUTING_RULES，按文件类型/扩展名/大小等选择目标群组和话题，修改后自动重新加载)
+    ROUTING_CONFIG_PATH = os.getenv('ROUTING_CONFIG_PATH', 'bot_config.json')
+    ROUTING_RELOAD_INTERVAL = float(os.getenv('ROUTING_RELOAD_INTERVAL', '5'))  # 检查配置文件修改的间隔（秒）
+    
+    # 话题注册表 (话题信息常驻内存，按间隔批量写回磁盘)
+    TOPICS_PATH = os.getenv('TOPICS_PATH', 'detected_topics.json')
+    TOPICS_FLUSH_INTERVAL = float(os.getenv('TOPICS_FLUSH_INTERVAL', '10'))  # 写回间隔（秒）
+    
     # 允许的用户ID列表 (可选，如果为空则允许所有用户)
     ALLOWED_USERS = os.getenv('ALLOWED_USERS', '').split(',') if os.getenv('ALLOWED_USERS') else []
     
+    # 管理员用户ID列表 (可使用 /force 等管理命令)
+    ADMIN_USERS = os.getenv('ADMIN_USERS', '').split(',') if os.getenv('ADMIN_USERS') else []
+    
     # 日志配置
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
     LOG_FILE = os.getenv('LOG_FILE', 'bot.log')
+    LOG_ASYNC = os.getenv('LOG_ASYNC', 'true').lower() in ('1', 'true', 'yes')  # 日志由后台线程写入，不阻塞事件循环
+    LOG_JSON = os.getenv('LOG_JSON', 'false').lower() in ('1', 'true', 'yes')  # 输出 JSON 格式的日志
+    LOG_SAMPLE_EVERY = int(os.getenv('LOG_SAMPLE_EVERY', '10'))  # 控制台只输出每 N 个更新中 1 个的逐文件 INFO 日志（按关联ID采样，文件日志完整），1 表示全部输出
     
     # 文件大小限制 (MB)
     MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE', '2048'))  # 2GB = 2048MB
     
+    # 转发队列配置
+    FORWARD_WORKERS = int(os.getenv('FORWARD_WORKERS', '4'))  # 转发工作协程数量
+    FORWARD_QUEUE_SIZE = int(os.getenv('FORWARD_QUEUE_SIZE', '1000'))  # 队列最大长度，0 表示不限制
+    
+    # 相册聚合窗口 (秒)：同一相册的文件在此时间内到齐后合并为一次发送
+    ALBUM_WINDOW = float(os.getenv('ALBUM_WINDOW', '1.5'))
+    
+    # 进度消息两次编辑之间的最小间隔 (秒)
+    PROGRESS_INTERVAL = float(os.getenv('PROGRESS_INTERVAL', '3'))
+    
+    # 批量复制模式：连续上传的文件聚合后使用 copyMessages 一次复制 (最多100条)
+    BATCH_COPY_ENABLED = os.getenv('BATCH_COPY_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    BATCH_WINDOW = float(os.getenv('BATCH_WINDOW', '3'))  # 最后一个文件到达后等待的秒数
+    
+    # 限流配置 (Telegram 官方限制：全局约30条/秒，同一群组约20条/分钟，同一私聊约1条/秒)
+    RATE_LIMIT_GLOBAL_PER_SECOND = float(os.getenv('RATE_LIMIT_GLOBAL_PER_SECOND', '30'))
+    RATE_LIMIT_GROUP_PER_MINUTE = float(os.getenv('RATE_LIMIT_GROUP_PER_MINUTE', '20'))
+    RATE_LIMIT_PRIVATE_PER_SECOND = float(os.getenv('RATE_LIMIT_PRIVATE_PER_SECOND', '1'))
+    RATE_LIMIT_TOPIC_PER_MINUTE = float(os.getenv('RATE_LIMIT_TOPIC_PER_MINUTE', '0'))  # 0 表示不单独限制话题
+    RATE_LIMIT_MAX_RETRIES = int(os.getenv('RATE_LIMIT_MAX_RETRIES', '3'))  # 遇到 429 时的最大重试次数
+    
+    # 发件箱配置 (转发任务持久化，重启后自动重放)
+    OUTBOX_PATH = os.getenv('OUTBOX_PATH', 'data/outbox.db')
+    OUTBOX_RETENTION_DAYS = float(os.getenv('OUTBOX_RETENTION_DAYS', '7'))  # 已完成任务保留天数
+    
+    # 去重配置 (按 file_unique_id 跳过已转发到同一群组/话题的文件)
+    DEDUP_ENABLED = os.getenv('DEDUP_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    DEDUP_PATH = os.getenv('DEDUP_PATH', 'data/dedup.db')
+    DEDUP_CACHE_SIZE = int(os.getenv('DEDUP_CACHE_SIZE', '10000'))  # 内存中缓存的最大条目数
+    
+    # 关闭时等待转发队列处理完毕的最长时间（秒），应小于容器的停止等待时间
+    SHUTDOWN_GRACE_PERIOD = float(os.getenv('SHUTDOWN_GRACE_PERIOD', '20'))
+    
+    # 启动时是否丢弃积压的更新 (发件箱按消息去重，可以安全地处理积压更新)
+    DROP_PENDING_UPDATES = os.getenv('DROP_PENDING_UPDATES', 'false').lower() in ('1', 'true', 'yes')
+    
+    # 重试与熔断 (网络错误按指数退避 + 抖动重试，Bot API 连续失败后熔断一段时间)
+    RETRY_BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', '1'))  # 首次重试等待（秒）
+    RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', '60'))  # 最大重试等待（秒）
+    FORWARD_MAX_ATTEMPTS = int(os.getenv('FORWARD_MAX_ATTEMPTS', '8'))  # 转发任务按退避重试的次数，之后每 RETRY_MAX_DELAY 秒重试一次
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))  # 连续失败多少次后熔断
+    CIRCUIT_RESET_TIMEOUT = float(os.getenv('CIRCUIT_RESET_TIMEOUT', '1'))  # 熔断多久后放行探测请求（秒），探测失败时加倍
+    CIRCUIT_MAX_RESET_TIMEOUT = float(os.getenv('CIRCUIT_MAX_RESET_TIMEOUT', '30'))  # 熔断冷却时间上限（秒）
+    
+    # 并发处理的更新数 (不同聊天并发，同一聊天按顺序；1 表示逐条处理)
+    CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '16'))
+    
+    # 自建 Bot API 服务器 (可选，留空使用官方云端 API)
+    BOT_API_BASE_URL = os.getenv('BOT_API_BASE_URL', '')  # 例如 http://telegram-bot-api:8081/bot
+    BOT_API_BASE_FILE_URL = os.getenv('BOT_API_BASE_FILE_URL', '')  # 留空时由 BOT_API_BASE_URL 推导（末尾的 /bot -> /file/bot）
+    BOT_API_LOCAL_MODE = os.getenv('BOT_API_LOCAL_MODE', 'false').lower() in ('1', 'true', 'yes')  # 服务器以 --local 运行
+    
+    # HTTP 传输 (发送请求与长轮询使用独立的连接池)
+    SEND_POOL_SIZE = int(os.getenv('SEND_POOL_SIZE', '0'))  # 发送连接池大小，0 表示按并发数自动估算
+    SEND_CONNECT_TIMEOUT = float(os.getenv('SEND_CONNECT_TIMEOUT', '10'))
+    SEND_READ_TIMEOUT = float(os.getenv('SEND_READ_TIMEOUT', '60'))
+    SEND_WRITE_TIMEOUT = float(os.getenv('SEND_WRITE_TIMEOUT', '60'))
+    SEND_POOL_TIMEOUT = float(os.getenv('SEND_POOL_TIMEOUT', '10'))  # 等待空闲连接的时间
+    SEND_HTTP2 = os.getenv('SEND_HTTP2', 'false').lower() in ('1', 'true', 'yes')  # 需要安装 h2
+    SEND_KEEPALIVE_EXPIRY = float(os.getenv('SEND_KEEPALIVE_EXPIRY', '30'))  # 空闲连接保留时间（秒）
+    POLL_CONNECT_TIMEOUT = float(os.getenv('POLL_CONNECT_TIMEOUT', '10'))
+    POLL_READ_TIMEOUT = float(os.getenv('POLL_READ_TIMEOUT', '10'))  # 会自动加上长轮询的等待时间
+    
+    # 接收更新的方式: polling (长轮询) 或 webhook (内嵌 HTTP 服务器接收推送)
+    BOT_MODE = os.getenv('BOT_MODE', 'polling').lower()
+    WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')  # 公网地址，例如 https://bot.example.com
+    WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+    WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN', '')  # 为空时每次启动随机生成
+    WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '')  # 留空时 webhook 模式监听 0.0.0.0，长轮询模式只监听 127.0.0.1
+    WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+    WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))  # Telegram 同时推送的最大连接数
+    
+    # 健康检查：内嵌 HTTP 服务器（WEBHOOK_LISTEN:WEBHOOK_PORT）提供 /healthz 和 /readyz，长轮询模式下同样启动
+    HEALTH_ENABLED = os.getenv('HEALTH_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    HEALTH_MAX_LOOP_LAG = float(os.getenv('HEALTH_MAX_LOOP_LAG', '5'))  # 事件循环延迟超过此值视为不健康（秒）
+    HEALTH_POLL_STALE_AFTER = float(os.getenv('HEALTH_POLL_STALE_AFTER', '120'))  # 超过此时间没有成功轮询视为未就绪（秒）
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')  # 在 HTTP 服务器上提供 /metrics
+    PROFILE_SAMPLE_EVERY = int(os.getenv('PROFILE_SAMPLE_EVERY', '0'))  # 每 N 个更新记录一次各阶段耗时，0 表示只通过 /profile 开启
+    
     @classmethod
     def validate(cls):
         """验证配置"""
@@ -35,4 +131,32 @@ class Config:
         if not cls.TARGET_GROUP_ID or cls.TARGET_GROUP_ID == '-1001234567890':
             print("警告: 请设置正确的 TARGET_GROUP_ID")
         
+        if cls.BOT_MODE not in ('polling', 'webhook'):
+            raise ValueError(f"BOT_MODE 只能是 polling 或 webhook，当前为: {cls.BOT_MODE}")
+        
+        if cls.BOT_MODE == 'webhook' and not cls.WEBHOOK_URL:
+            raise ValueError("webhook 模式需要设置 WEBHOOK_URL")
+        
+        if cls.BOT_API_LOCAL_MODE and not cls.BOT_API_BASE_URL:
+            raise ValueError("BOT_API_LOCAL_MODE 需要同时设置 BOT_API_BASE_URL")
+        
+        if cls.BOT_API_BASE_URL and not cls.get_base_file_url():
+            raise ValueError("BOT_API_BASE_URL 不以 /bot 结尾时需要设置 BOT_API_BASE_FILE_URL")
+        
         return True
+    
+    @classmethod
+    def get_listen_host(cls) -> str:
+        """HTTP 服务器监听地址：长轮询模式下只有健康检查和指标，默认不对外暴露"""
+        if cls.WEBHOOK_LISTEN:
+            return cls.WEBHOOK_LISTEN
+        return '0.0.0.0' if cls.BOT_MODE == 'webhook' else '127.0.0.1'
+    
+    @classmethod
+    def get_base_file_url(cls) -> str:
+        """自建服务器的文件地址：未设置时把 BOT_API_BASE_URL 末尾的 /bot 换成 /file/bot，无法推导时返回空字符串"""
+        if cls.BOT_API_BASE_FILE_URL:
+            return cls.BOT_API_BASE_FILE_URL
+        if cls.BOT_API_BASE_URL.endswith('/bot'):
+            return cls.BOT_API_BASE_URL[:-len('/bot')] + '/file/bot'
+        return ''
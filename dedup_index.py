@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+去重索引模块
+记录每个目标群组/话题已转发过的 file_unique_id，避免重复发送同一文件
+"""
+
+import os
+import time
+import asyncio
+import sqlite3
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+
+
+class DedupIndex:
+    """
+    转发去重索引
+
+    全量记录保存在 SQLite 中，内存里只保留最近使用的条目（LRU），
+    命中内存时无需访问磁盘，未命中时按主键查询。
+
+    查询和记录之间隔着发送请求，发送前需要 reserve 预占，发送结束后 release；
+    其他任务遇到已预占的文件时等待 pending 返回的事件，再重新查询（reserve_unsent）；
+    只能释放自己预占的文件，否则等待中的任务会在发送结束前被唤醒，重复发送
+    """
+
+    def __init__(self, path: str, cache_size: int = 10000):
+        """
+        初始化去重索引
+
+        Args:
+            path: SQLite 数据库文件路径
+            cache_size: 内存中缓存的最大条目数
+        """
+        self.path = path
+        self.cache_size = max(1, cache_size)
+        self._cache: "OrderedDict[Tuple[int, int, str], int]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pending: Dict[Tuple[int, int, str], asyncio.Event] = {}
+
+    def open(self) -> None:
+        """打开数据库并建表"""
+        if self._conn is not None:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS forwarded_files (
+                chat_id INTEGER NOT NULL,
+                thread_id INTEGER NOT NULL,
+                file_unique_id TEXT NOT NULL,
+                message_id INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (chat_id, thread_id, file_unique_id)
+            ) WITHOUT ROWID
+            """
+        )
+        logger.info(f"去重索引已打开: {self.path}")
+
+    def close(self) -> None:
+        """关闭数据库"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        self._cache.clear()
+
+    def lookup(self, chat_id: int, thread_id: Optional[int], file_unique_id: str) -> Optional[int]:
+        """
+        查询文件是否已转发到指定目标
+
+        Args:
+            chat_id: 目标群组ID
+            thread_id: 目标话题ID（无话题为 None）
+            file_unique_id: 文件唯一ID
+
+        Returns:
+            int: 已转发消息的ID，未转发过返回 None
+        """
+        if not file_unique_id:
+            return None
+
+        key = (chat_id, thread_id or 0, file_unique_id)
+        message_id = self._cache.get(key)
+        if message_id is not None:
+            self._cache.move_to_end(key)
+            return message_id
+
+        row = self._conn.execute(
+            "SELECT message_id FROM forwarded_files "
+            "WHERE chat_id = ? AND thread_id = ? AND file_unique_id = ?",
+            key
+        ).fetchone()
+        if row is None:
+            return None
+
+        self._remember(key, row[0])
+        return row[0]
+
+    def record(self, chat_id: int, thread_id: Optional[int], file_unique_id: str, message_id: int) -> None:
+        """
+        记录文件已转发到指定目标
+
+        Args:
+            chat_id: 目标群组ID
+            thread_id: 目标话题ID（无话题为 None）
+            file_unique_id: 文件唯一ID
+            message_id: 转发后的消息ID
+        """
+        if not file_unique_id:
+            return
+
+        key = (chat_id, thread_id or 0, file_unique_id)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO forwarded_files "
+            "(chat_id, thread_id, file_unique_id, message_id, created_at) VALUES (?, ?, ?, ?, ?)",
+            (*key, message_id, time.time())
+        )
+        self._remember(key, message_id)
+
+    def pending(self, chat_id: int, thread_id: Optional[int], file_unique_id: str) -> Optional[asyncio.Event]:
+        """
+        查询文件是否正在被其他任务发送到指定目标
+
+        Returns:
+            asyncio.Event: 发送结束（release）时触发的事件，没有任务在发送时返回 None
+        """
+        return self._pending.get((chat_id, thread_id or 0, file_unique_id))
+
+    def reserve(self, chat_id: int, thread_id: Optional[int], file_unique_id: str) -> None:
+        """预占文件，发送结束后（无论成功与否）必须调用 release"""
+        if file_unique_id:
+            self._pending.setdefault((chat_id, thread_id or 0, file_unique_id), asyncio.Event())
+
+    def release(self, chat_id: int, thread_id: Optional[int], file_unique_id: str) -> None:
+        """释放预占并唤醒等待的任务（发送成功时应先 record）"""
+        event = self._pending.pop((chat_id, thread_id or 0, file_unique_id), None)
+        if event is not None:
+            event.set()
+
+    async def reserve_unsent(
+        self, chat_id: int, thread_id: Optional[int], file_unique_ids: List[str]
+    ) -> Tuple[List[int], Dict[int, int]]:
+        """
+        查询并预占需要发送的文件，调用方发送结束后只 release 返回的 to_send 中的文件
+
+        有文件正由其他任务发送时，等它发送结束后整体重新查询；
+        全部文件可以一次性预占时才预占（查询与预占之间没有 await），不会出现两个任务互相等待
+
+        Args:
+            chat_id: 目标群组ID
+            thread_id: 目标话题ID（无话题为 None）
+            file_unique_ids: 要发送的文件唯一ID列表
+
+        Returns:
+            tuple: (需要发送并已预占的文件下标列表, 已转发过的文件 {下标: 原消息ID})
+        """
+        while True:
+            to_send, duplicates, busy = [], {}, None
+            for index, file_unique_id in enumerate(file_unique_ids):
+                original_message_id = self.lookup(chat_id, thread_id, file_unique_id)
+                if original_message_id is not None:
+                    duplicates[index] = original_message_id
+                    continue
+                busy = self.pending(chat_id, thread_id, file_unique_id)
+                if busy is not None:
+                    break
+                to_send.append(index)
+
+            if busy is None:
+                break
+            await busy.wait()
+
+        for index in to_send:
+            self.reserve(chat_id, thread_id, file_unique_ids[index])
+        return to_send, duplicates
+
+    def _remember(self, key: Tuple[int, int, str], message_id: int) -> None:
+        """写入内存缓存，超出容量时淘汰最久未使用的条目"""
+        self._cache[key] = message_id
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+转发目标模块
+描述文件要转发到的群组/话题
+"""
+
+from typing import List, NamedTuple, Optional
+from loguru import logger
+
+
+class Destination(NamedTuple):
+    """转发目标（群组 + 可选的话题）"""
+
+    chat_id: int
+    topic_id: Optional[int] = None
+    name: str = ''
+
+    @property
+    def key(self) -> str:
+        """目标的唯一标识，用于记录每个目标的发送状态"""
+        return f"{self.chat_id}:{self.topic_id or 0}"
+
+    @property
+    def display_name(self) -> str:
+        """用于日志和提示的名称"""
+        if self.name:
+            return self.name
+        return f"{self.chat_id}/{self.topic_id}" if self.topic_id else str(self.chat_id)
+
+
+def parse_destinations(spec: str) -> List[Destination]:
+    """
+    解析目标列表配置
+
+    格式为逗号分隔的 [名称=]群组ID[:话题ID]，例如：
+    backup=-1001111111111:5,archive=-1002222222222
+
+    Args:
+        spec: 目标列表字符串
+
+    Returns:
+        List[Destination]: 解析出的目标，格式错误的条目会被忽略
+    """
+    destinations = []
+    for entry in (spec or '').split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+
+        name = ''
+        if '=' in entry:
+            name, entry = (part.strip() for part in entry.split('=', 1))
+
+        chat_part, _, topic_part = entry.partition(':')
+        try:
+            chat_id = int(chat_part)
+            topic_id = int(topic_part) if topic_part.strip() else None
+        except ValueError:
+            logger.warning(f"转发目标格式错误，已忽略: {entry}")
+            continue
+
+        destinations.append(Destination(chat_id, topic_id, name))
+
+    return destinations
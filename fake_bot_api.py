@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地模拟 Bot API 服务器
+用于离线压测：实现机器人用到的接口（getUpdates、send*、copyMessages、editMessageText 等），
+可配置响应延迟，记录每次调用以及上传文件的投递/转发时间。只依赖标准库
+"""
+
+import json
+import time
+import asyncio
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl
+
+# 发送文件的接口 -> 文件参数名
+SEND_FILE_METHODS = {
+    'sendDocument': 'document',
+    'sendPhoto': 'photo',
+    'sendVideo': 'video',
+    'sendAudio': 'audio',
+    'sendVoice': 'voice',
+    'sendAnimation': 'animation',
+    'sendVideoNote': 'video_note',
+    'sendSticker': 'sticker'
+}
+
+# 直接返回 True 的接口
+TRUE_METHODS = {'deleteWebhook', 'setWebhook', 'setMyCommands', 'deleteMessages', 'close', 'logOut'}
+
+STATUS_TEXT = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 409: 'Conflict',
+    429: 'Too Many Requests', 502: 'Bad Gateway'
+}
+
+
+class FakeBotAPI:
+    """模拟的 Bot API 服务器"""
+
+    def __init__(self, token: str, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0):
+        """
+        初始化服务器
+
+        Args:
+            token: 机器人 token（只接受该 token 的请求）
+            host: 监听地址
+            port: 监听端口，0 表示随机
+            latency: 除 getUpdates 外每个请求的响应延迟（秒）
+        """
+        self.token = token
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self.uploaded: Dict[str, float] = {}    # 文件ID -> 模拟用户上传的时间
+        self.delivered: Dict[str, float] = {}   # 文件ID -> 通过 getUpdates 投递给机器人的时间
+        self.forwarded: Dict[str, List[float]] = {}  # 文件ID -> 每次被转发到群组的时间
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[asyncio.Task] = set()
+        self._updates: List[Dict[str, Any]] = []
+        self._new_updates: Optional[asyncio.Event] = None
+        self._update_id = 0
+        self._message_id = 0
+        # (聊天ID, 消息ID) -> 文件ID，用于识别 copyMessages 复制的文件
+        self._uploads: Dict[Tuple[int, int], str] = {}
+
+    @property
+    def base_url(self) -> str:
+        """BOT_API_BASE_URL"""
+        return f"http://{self.host}:{self.port}/bot"
+
+    async def start(self) -> None:
+        self._new_updates = asyncio.Event()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            # 关闭仍保持着的 keep-alive 连接（包括等待中的长轮询）
+            for task in self._connections:
+                task.cancel()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    # ---- 构造更新 ----
+
+    def push_update(self, update: Dict[str, Any]) -> int:
+        """加入一个更新，返回分配的 update_id"""
+        self._update_id += 1
+        update['update_id'] = self._update_id
+        self._updates.append(update)
+        self._new_updates.set()
+        return self._update_id
+
+    def upload(
+        self,
+        chat_id: int,
+        file_type: str,
+        file_id: str,
+        file_size: int = 1024,
+        file_name: Optional[str] = None,
+        media_group_id: Optional[str] = None
+    ) -> int:
+        """模拟用户在私聊中上传一个文件，返回 update_id"""
+        self._message_id += 1
+        message = {
+            'message_id': self._message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private', 'first_name': 'Bench'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Bench'}
+        }
+        media = {'file_id': file_id, 'file_unique_id': file_id, 'file_size': file_size}
+        if file_type == 'photo':
+            message['photo'] = [dict(media, width=1280, height=720)]
+        elif file_type == 'video':
+            message['video'] = dict(media, width=1280, height=720, duration=10, file_name=file_name)
+        elif file_type == 'audio':
+            message['audio'] = dict(media, duration=10, file_name=file_name)
+        elif file_type == 'voice':
+            message['voice'] = dict(media, duration=10)
+        elif file_type == 'animation':
+            # 与真实的 Bot API 一致，动图消息同时带有 document
+            message['animation'] = dict(media, width=320, height=240, duration=3, file_name=file_name)
+            message['document'] = dict(media, file_name=file_name or f"{file_id}.mp4")
+        elif file_type == 'video_note':
+            message['video_note'] = dict(media, length=240, duration=10)
+        elif file_type == 'sticker':
+            message['sticker'] = dict(
+                media, width=512, height=512, is_animated=False, is_video=False, type='regular'
+            )
+        else:
+            message['document'] = dict(media, file_name=file_name or f"{file_id}.bin")
+        if media_group_id:
+            message['media_group_id'] = media_group_id
+
+        self._uploads[(chat_id, self._message_id)] = file_id
+        self.uploaded[file_id] = time.monotonic()
+        return self.push_update({'message': message})
+
+    # ---- HTTP ----
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """HTTP/1.1 keep-alive 连接：依次处理请求"""
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0) or 0))
+
+                path = request_line.decode('latin-1').split(' ')[1]
+                status, payload = await self._dispatch(path, headers.get('content-type', ''), body)
+                if status is None:
+                    # 模拟连接被重置：不返回响应直接断开
+                    break
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'Error')}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # 连接断开，或服务器停止时取消
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    @staticmethod
+    def _parse_params(content_type: str, body: bytes) -> Dict[str, Any]:
+        if content_type.startswith('application/json'):
+            return json.loads(body or b'{}')
+        return dict(parse_qsl(body.decode()))
+
+    async def _dispatch(self, path: str, content_type: str, body: bytes) -> Tuple[Optional[int], Dict[str, Any]]:
+        """返回 (状态码, 响应体)，状态码为 None 时断开连接"""
+        prefix = f"/bot{self.token}/"
+        if not path.startswith(prefix):
+            return 404, {'ok': False, 'error_code': 404, 'description': 'Not Found'}
+        method = path[len(prefix):]
+        params = self._parse_params(content_type, body)
+        self.calls[method] += 1
+
+        fault = await self.inject_fault(method, params)
+        if fault is not None:
+            return fault
+
+        if method == 'getUpdates':
+            return 200, {'ok': True, 'result': await self._get_updates(params)}
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        result = self._handle_method(method, params)
+        if result is None:
+            return 404, {'ok': False, 'error_code': 404, 'description': 'Not Found: method not found'}
+        return 200, {'ok': True, 'result': result}
+
+    async def inject_fault(self, method: str, params: Dict[str, Any]) -> Optional[Tuple[Optional[int], Dict[str, Any]]]:
+        """
+        故障注入钩子（子类覆盖）：返回 (状态码, 响应体) 代替正常响应，状态码为 None 时断开连接；
+        返回 None 时正常处理（可以先等待一段时间模拟慢响应）
+        """
+        return None
+
+    # ---- 接口实现 ----
+
+    async def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """长轮询：没有新更新时等待到超时"""
+        offset = int(params.get('offset') or 0)
+        if offset:
+            self._updates = [u for u in self._updates if u['update_id'] >= offset]
+        if not self._updates:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), float(params.get('timeout') or 0))
+            except asyncio.TimeoutError:
+                pass
+
+        updates = self._updates[:int(params.get('limit') or 100)]
+        now = time.monotonic()
+        for update in updates:
+            file_id = self._file_id_of(update.get('message', {}))
+            if file_id is not None:
+                self.delivered.setdefault(file_id, now)
+        return updates
+
+    @staticmethod
+    def _file_id_of(message: Dict[str, Any]) -> Optional[str]:
+        for key in ('document', 'video', 'audio', 'voice', 'video_note', 'sticker'):
+            if key in message:
+                return message[key]['file_id']
+        if 'photo' in message:
+            return message['photo'][-1]['file_id']
+        return None
+
+    def _record_forward(self, file_id: Optional[str]) -> None:
+        if file_id is not None:
+            self.forwarded.setdefault(file_id, []).append(time.monotonic())
+
+    def _message(self, params: Dict[str, Any], **content) -> Dict[str, Any]:
+        """构造发送后返回的消息"""
+        self._message_id += 1
+        chat_id = int(params['chat_id'])
+        message = {
+            'message_id': self._message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'supergroup' if chat_id < 0 else 'private'}
+        }
+        if params.get('message_thread_id'):
+            message['message_thread_id'] = int(params['message_thread_id'])
+            message['is_topic_message'] = True
+        message.update(content)
+        return message
+
+    def _handle_method(self, method: str, params: Dict[str, Any]) -> Any:
+        if method == 'getMe':
+            return {
+                'id': int(self.token.split(':')[0]), 'is_bot': True, 'first_name': 'Fake',
+                'username': 'fake_bot', 'can_join_groups': True,
+                'can_read_all_group_messages': False, 'supports_inline_queries': False
+            }
+        if method in TRUE_METHODS:
+            return True
+        if method in SEND_FILE_METHODS:
+            file_id = params[SEND_FILE_METHODS[method]]
+            self._record_forward(file_id)
+            return self._message(params, caption=params.get('caption', ''))
+        if method == 'sendMessage':
+            return self._message(params, text=params.get('text', ''))
+        if method == 'editMessageText':
+            return self._message(params, text=params.get('text', ''), edit_date=int(time.time()))
+        if method == 'sendMediaGroup':
+            messages = []
+            for media in json.loads(params['media']):
+                self._record_forward(media['media'])
+                messages.append(self._message(params))
+            return messages
+        if method == 'copyMessages':
+            from_chat_id = int(params['from_chat_id'])
+            result = []
+            for message_id in json.loads(params['message_ids']):
+                self._record_forward(self._uploads.get((from_chat_id, message_id)))
+                self._message_id += 1
+                result.append({'message_id': self._message_id})
+            return result
+        return None
@@ -8,9 +8,10 @@
 import os
 import mimetypes
 from datetime import datetime
-from typing import Dict, Optional, Any
 from telegram import Message
 from loguru import logger
+from media import FileInfo, ProcessResult, get_attachment
+from utils import sampled_logger
 
 
 class FileProcessor:
@@ -25,7 +26,7 @@ class FileProcessor:
             'audio': ['.mp3', '.wav', '.ogg', '.flac', '.aac', '.m4a', '.wma']
         }
     
-    async def process_file(self, message: Message, config) -> Dict[str, Any]:
+    async def process_file(self, message: Message, config) -> ProcessResult:
         """
         处理文件消息
         
@@ -34,120 +35,50 @@ class FileProcessor:
             config: 配置对象
             
         Returns:
-            Dict: 处理结果
+            ProcessResult: 处理结果
         """
         try:
-            # 获取文件信息
-            file_info = await self._get_file_info(message)
+            # 按附件类型查表提取文件信息
+            kind, attachment = get_attachment(message)
             
-            if not file_info:
-                return {'success': False, 'error': '无法获取文件信息'}
+            if kind is None:
+                return ProcessResult(None, '无法获取文件信息')
             
             # 检查文件大小
-            if not self._check_file_size(file_info, config.MAX_FILE_SIZE):
-                return {
-                    'success': False, 
-                    'error': f'文件过大，最大支持 {config.MAX_FILE_SIZE}MB'
-                }
+            file_size = attachment.file_size or 0
+            if not self._check_file_size(file_size, config.MAX_FILE_SIZE):
+                return ProcessResult(None, f'文件过大，最大支持 {config.MAX_FILE_SIZE}MB')
             
-            # 生成文件标题
-            title = self._generate_title(message, file_info)
+            file_name, mime_type = kind.extract(attachment)
+            caption = message.caption or ''
+            file_info = FileInfo(
+                file_type=kind.file_type,
+                file_id=attachment.file_id,
+                file_unique_id=attachment.file_unique_id,
+                file_name=file_name,
+                file_size=file_size,
+                mime_type=mime_type,
+                title=self._generate_title(caption, file_name, kind.label),
+                original_caption=caption,
+                message_id=message.message_id
+            )
             
-            # 构建结果
-            result = {
-                'success': True,
-                'file_id': file_info['file_id'],
-                'file_type': file_info['file_type'],
-                'title': title,
-                'file_name': file_info['file_name'],
-                'file_size': file_info['file_size'],
-                'mime_type': file_info['mime_type'],
-                'upload_time': datetime.now().isoformat(),
-                'original_caption': message.caption or ''
-            }
-            
-            logger.info(f"文件处理成功: {file_info['file_name']} ({file_info['file_type']})")
-            return result
+            sampled_logger.info(f"文件处理成功: {file_name} ({kind.file_type})")
+            return ProcessResult(file_info, '')
             
         except Exception as e:
             logger.error(f"文件处理失败: {str(e)}")
-            return {'success': False, 'error': f'处理文件时发生错误: {str(e)}'}
+            return ProcessResult(None, f'处理文件时发生错误: {str(e)}')
     
-    async def _get_file_info(self, message: Message) -> Optional[Dict[str, Any]]:
-        """获取文件信息"""
-        try:
-            file_info = {}
-            
-            if message.document:
-                # 文档文件
-                document = message.document
-                file_info = {
-                    'file_id': document.file_id,
-                    'file_name': document.file_name or '未知文档',
-                    'file_size': document.file_size or 0,
-                    'mime_type': document.mime_type or 'application/octet-stream',
-                    'file_type': 'document'
-                }
-                
-            elif message.photo:
-                # 图片文件
-                photo = message.photo[-1]  # 获取最高质量的图片
-                file_info = {
-                    'file_id': photo.file_id,
-                    'file_name': f'图片_{photo.file_unique_id}.jpg',
-                    'file_size': photo.file_size or 0,
-                    'mime_type': 'image/jpeg',
-                    'file_type': 'photo'
-                }
-                
-            elif message.video:
-                # 视频文件
-                video = message.video
-                file_info = {
-                    'file_id': video.file_id,
-                    'file_name': video.file_name or f'视频_{video.file_unique_id}.mp4',
-                    'file_size': video.file_size or 0,
-                    'mime_type': video.mime_type or 'video/mp4',
-                    'file_type': 'video'
-                }
-                
-            elif message.audio:
-                # 音频文件
-                audio = message.audio
-                file_info = {
-                    'file_id': audio.file_id,
-                    'file_name': audio.file_name or f'音频_{audio.file_unique_id}.mp3',
-                    'file_size': audio.file_size or 0,
-                    'mime_type': audio.mime_type or 'audio/mpeg',
-                    'file_type': 'audio'
-                }
-                
-            elif message.voice:
-                # 语音消息
-                voice = message.voice
-                file_info = {
-                    'file_id': voice.file_id,
-                    'file_name': f'语音_{voice.file_unique_id}.ogg',
-                    'file_size': voice.file_size or 0,
-                    'mime_type': 'audio/ogg',
-                    'file_type': 'voice'
-                }
-            
-            return file_info if file_info else None
-            
-        except Exception as e:
-            logger.error(f"获取文件信息失败: {str(e)}")
-            return None
-    
-    def _check_file_size(self, file_info: Dict[str, Any], max_size_mb: int) -> bool:
+    def _check_file_size(self, file_size: int, max_size_mb: int) -> bool:
         """检查文件大小"""
-        if not file_info.get('file_size'):
+        if not file_size:
             return True  # 如果无法获取文件大小，允许通过
         
-        file_size_mb = file_info['file_size'] / (1024 * 1024)
+        file_size_mb = file_size / (1024 * 1024)
         return file_size_mb <= max_size_mb
     
-    def _generate_title(self, message: Message, file_info: Dict[str, Any]) -> str:
+    def _generate_title(self, caption: str, file_name: str, type_name: str) -> str:
         """
         生成文件标题
         
@@ -158,11 +89,10 @@ class FileProcessor:
         """
         try:
             # 1. 优先使用用户提供的 caption
-            if message.caption and message.caption.strip():
-                return message.caption.strip()
+            if caption and caption.strip():
+                return caption.strip()
             
             # 2. 使用原始文件名（去除扩展名）
-            file_name = file_info.get('file_name', '')
             if file_name and file_name != '未知文档':
                 # 去除文件扩展名
                 name_without_ext = os.path.splitext(file_name)[0]
@@ -170,18 +100,7 @@ class FileProcessor:
                     return name_without_ext
             
             # 3. 根据文件类型生成默认标题
-            file_type = file_info.get('file_type', 'document')
             current_time = datetime.now().strftime('%Y-%m-%d %H:%M')
-            
-            type_names = {
-                'document': '文档',
-                'photo': '图片',
-                'video': '视频',
-                'audio': '音频',
-                'voice': '语音'
-            }
-            
-            type_name = type_names.get(file_type, '文件')
             return f"{type_name} - {current_time}"
             
         except Exception as e:
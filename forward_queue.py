@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+转发队列模块
+处理器只负责校验和入队，由后台工作协程池负责实际转发
+"""
+
+import time
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from loguru import logger
+from media import FileInfo
+from destinations import Destination
+from tracing import Trace, current_trace
+
+
+@dataclass
+class ForwardJob:
+    """转发任务"""
+
+    result: FileInfo            # FileProcessor.process_file 提取的文件信息
+    user: Any                   # 上传文件的 Telegram 用户
+    file_type: str              # 文件类型显示名称（文档/图片/...）
+    chat_id: int                # 上传者所在聊天，用于回报结果
+    message_id: int             # 上传消息ID，回报时引用
+    force: bool = False         # 管理员强制重发（跳过去重）
+    album: List[FileInfo] = field(default_factory=list)  # 相册/批量中所有文件的信息
+    batch_copy: bool = False    # 使用 copyMessages 批量复制
+    destinations: List[Destination] = field(default_factory=list)  # 入队时确定的转发目标，重试和重放沿用
+    done_destinations: List[str] = field(default_factory=list)  # 已成功的转发目标（Destination.key）
+    failed_destinations: Dict[str, str] = field(default_factory=dict)  # 永久失败的转发目标 {Destination.key: 错误}
+    user_id: Optional[int] = None  # 上传者ID（重放时没有用户对象，单独保存）
+    attempts: int = 0           # 因网络错误重新入队的次数
+    job_id: Optional[int] = None  # 发件箱中的任务ID
+    enqueued_at: float = field(default_factory=time.monotonic)
+    trace: Optional[Trace] = field(default_factory=current_trace, repr=False)  # 创建任务的更新的追踪信息（不持久化）
+
+    def __post_init__(self):
+        if self.user_id is None:
+            self.user_id = getattr(self.user, 'id', None)
+
+    def to_payload(self) -> Dict[str, Any]:
+        """转换为可持久化的字典（用户对象只保存ID）"""
+        return {
+            'result': self.result.to_dict(),
+            'user_id': self.user_id,
+            'file_type': self.file_type,
+            'chat_id': self.chat_id,
+            'message_id': self.message_id,
+            'force': self.force,
+            'album': [result.to_dict() for result in self.album],
+            'batch_copy': self.batch_copy,
+            'destinations': [destination._asdict() for destination in self.destinations],
+            'done_destinations': self.done_destinations,
+            'failed_destinations': self.failed_destinations
+        }
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any], job_id: Optional[int] = None) -> 'ForwardJob':
+        """从持久化的字典恢复任务（重放时没有完整的用户对象）"""
+        return cls(
+            result=FileInfo.from_dict(payload['result']),
+            user=None,
+            file_type=payload['file_type'],
+            chat_id=payload['chat_id'],
+            message_id=payload['message_id'],
+            force=payload.get('force', False),
+            album=[FileInfo.from_dict(result) for result in payload.get('album', [])],
+            batch_copy=payload.get('batch_copy', False),
+            destinations=[Destination(**destination) for destination in payload.get('destinations', [])],
+            done_destinations=payload.get('done_destinations', []),
+            failed_destinations=payload.get('failed_destinations', {}),
+            user_id=payload.get('user_id'),
+            job_id=job_id
+        )
+
+
+class ForwardQueue:
+    """转发队列 + 工作协程池"""
+
+    def __init__(self, worker_count: int = 4, maxsize: int = 0):
+        """
+        初始化转发队列
+
+        Args:
+            worker_count: 工作协程数量
+            maxsize: 队列最大长度，0 表示不限制
+        """
+        self.worker_count = max(1, worker_count)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._workers: List[asyncio.Task] = []
+        self._handler: Optional[Callable[[ForwardJob], Awaitable[None]]] = None
+        self._in_flight = 0
+
+    @property
+    def depth(self) -> int:
+        """队列中等待处理的任务数"""
+        return self._queue.qsize()
+
+    @property
+    def in_flight(self) -> int:
+        """正在处理的任务数"""
+        return self._in_flight
+
+    @property
+    def full(self) -> bool:
+        """队列是否已满"""
+        return self._queue.full()
+
+    @property
+    def running(self) -> bool:
+        """工作协程是否在运行"""
+        return bool(self._workers)
+
+    def submit(self, job: ForwardJob) -> int:
+        """
+        提交转发任务（不阻塞）
+
+        Args:
+            job: 转发任务
+
+        Returns:
+            int: 入队后的队列长度
+
+        Raises:
+            asyncio.QueueFull: 队列已满
+        """
+        self._queue.put_nowait(job)
+        return self._queue.qsize()
+
+    async def put(self, job: ForwardJob) -> None:
+        """提交转发任务，队列满时等待"""
+        await self._queue.put(job)
+
+    async def start(self, handler: Callable[[ForwardJob], Awaitable[None]]) -> None:
+        """
+        启动工作协程
+
+        Args:
+            handler: 处理单个转发任务的协程函数
+        """
+        if self._workers:
+            return
+
+        self._handler = handler
+        for index in range(self.worker_count):
+            task = asyncio.create_task(self._worker(index), name=f"forward-worker-{index}")
+            self._workers.append(task)
+
+        logger.info(f"转发队列已启动，工作协程数: {self.worker_count}")
+
+    async def drain(self, timeout: float) -> bool:
+        """
+        等待队列中和正在处理的任务全部完成
+
+        Args:
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            bool: 是否在超时前全部完成
+        """
+        if not self._workers:
+            return self._queue.empty()
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def stop(self) -> None:
+        """停止所有工作协程"""
+        if not self._workers:
+            return
+
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+        logger.info(f"转发队列已停止，剩余任务: {self.depth}")
+
+    async def _worker(self, index: int) -> None:
+        """工作协程：循环取出任务并处理"""
+        while True:
+            job = None
+            try:
+                job = await self._queue.get()
+                self._in_flight += 1
+                await self._handler(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if job is None:
+                    # 取任务失败（例如队列绑定到了其他事件循环），稍后再试，工作协程不退出
+                    logger.error(f"转发工作协程 {index} 获取任务失败: {str(e)}")
+                    await asyncio.sleep(1)
+                else:
+                    logger.error(f"转发工作协程 {index} 处理任务失败: {str(e)}")
+            finally:
+                if job is not None:
+                    self._in_flight -= 1
+                    self._queue.task_done()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+健康检查模块
+在进程内记录事件循环延迟、最近一次成功轮询和成功发送的时间，供 /healthz 和 /readyz 使用
+"""
+
+import time
+import asyncio
+from typing import Any, Dict, Optional
+from loguru import logger
+
+
+class HealthMonitor:
+    """进程内健康状态"""
+
+    def __init__(self, sample_interval: float = 1.0, max_loop_lag: float = 5.0, poll_stale_after: float = 120.0):
+        """
+        初始化健康状态
+
+        Args:
+            sample_interval: 事件循环延迟的采样间隔（秒）
+            max_loop_lag: 事件循环延迟超过此值视为不健康（秒）
+            poll_stale_after: 长轮询模式下超过此时间没有成功轮询视为未就绪（秒）
+        """
+        self.sample_interval = sample_interval
+        self.max_loop_lag = max_loop_lag
+        self.poll_stale_after = poll_stale_after
+        self.loop_lag = 0.0
+        self.started_at = time.monotonic()
+        self.last_tick: Optional[float] = None
+        self.last_poll: Optional[float] = None
+        self.last_send: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """启动事件循环延迟采样"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._sample_loop())
+
+    async def stop(self) -> None:
+        """停止采样"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _sample_loop(self) -> None:
+        """定时睡眠，实际醒来的时间比预期晚多少就是事件循环被阻塞的时间"""
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.sample_interval)
+            self.loop_lag = max(0.0, loop.time() - started - self.sample_interval)
+            self.last_tick = time.monotonic()
+            if self.loop_lag > self.max_loop_lag:
+                logger.warning(f"事件循环阻塞 {self.loop_lag:.2f} 秒")
+
+    def record_poll(self) -> None:
+        """收到更新（轮询成功或 webhook 推送）"""
+        self.last_poll = time.monotonic()
+
+    def record_send(self) -> None:
+        """转发发送成功"""
+        self.last_send = time.monotonic()
+
+    @staticmethod
+    def age(timestamp: Optional[float]) -> Optional[float]:
+        """距离某个时间点过去了多少秒，未发生过返回 None"""
+        if timestamp is None:
+            return None
+        return round(time.monotonic() - timestamp, 3)
+
+    def liveness(self) -> Dict[str, Any]:
+        """事件循环是否正常运转"""
+        tick_age = self.age(self.last_tick)
+        # 采样任务长时间没有醒来说明事件循环被卡住
+        stalled = tick_age is not None and tick_age > self.sample_interval + self.max_loop_lag
+        return {
+            'ok': self.loop_lag <= self.max_loop_lag and not stalled,
+            'loop_lag': round(self.loop_lag, 3),
+            'uptime': self.age(self.started_at)
+        }
+
+    def readiness(
+        self,
+        running: bool,
+        polling: bool,
+        bot_username: Optional[str],
+        queue_depth: int,
+        in_flight: int,
+        queue_full: bool,
+        circuit: str
+    ) -> Dict[str, Any]:
+        """
+        是否可以正常接收和转发文件
+
+        Args:
+            running: Application 是否正在运行
+            polling: 是否使用长轮询（webhook 模式没有推送时不代表异常，不检查轮询时间）
+            bot_username: 启动时 getMe 缓存的机器人用户名
+            queue_depth: 转发队列中等待的任务数
+            in_flight: 正在转发的任务数
+            queue_full: 转发队列是否已满
+            circuit: Bot API 熔断器状态
+        """
+        # 启动后还没有轮询成功时，从启动时间开始计算
+        poll_age = self.age(self.last_poll if self.last_poll is not None else self.started_at)
+        checks = {
+            'running': running,
+            'bot': bot_username is not None,
+            'poll': not polling or poll_age <= self.poll_stale_after,
+            'queue': not queue_full,
+            'circuit': circuit != 'open'
+        }
+        return {
+            'ok': all(checks.values()),
+            'checks': checks,
+            'bot': bot_username,
+            'loop_lag': round(self.loop_lag, 3),
+            'last_poll_age': self.age(self.last_poll),
+            'last_send_age': self.age(self.last_send),
+            'queue_depth': queue_depth,
+            'in_flight': in_flight,
+            'circuit': circuit
+        }
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+媒体类型模块
+上传文件的信息（FileInfo）和媒体类型表：每种附件类型对应一个提取函数、发送方法和相册类型，
+FileProcessor、转发和处理器注册都通过查表完成，新增媒体类型只需要在表中加一项
+"""
+
+from functools import reduce
+from operator import or_
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple, Type
+from telegram import InputMediaAudio, InputMediaDocument, InputMediaPhoto, InputMediaVideo, Message, Sticker
+from telegram.ext import filters
+
+
+class FileInfo(NamedTuple):
+    """上传文件的信息（FileProcessor 的处理结果，转发任务中持久化到发件箱）"""
+
+    file_type: str              # 媒体类型（MEDIA_KINDS 的键）
+    file_id: str
+    file_unique_id: str
+    file_name: str
+    file_size: int
+    mime_type: str
+    title: str = ''             # 转发时使用的标题
+    original_caption: str = ''  # 用户上传时的说明
+    message_id: int = 0         # 上传消息ID
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可持久化的字典"""
+        return self._asdict()
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'FileInfo':
+        """从持久化的字典恢复（忽略旧版本结果中的 success、upload_time 等字段）"""
+        return cls(**{name: data[name] for name in cls._fields if data.get(name) is not None})
+
+
+class ProcessResult(NamedTuple):
+    """FileProcessor.process_file 的结果：成功时 file 为文件信息，失败时 error 为原因"""
+
+    file: Optional[FileInfo] = None
+    error: str = ''
+
+    @property
+    def success(self) -> bool:
+        return self.file is not None
+
+
+class MediaKind(NamedTuple):
+    """一种附件类型"""
+
+    file_type: str              # 类型名，同时是消息属性名和 send_* 方法的文件参数名
+    label: str                  # 显示名称
+    send_method: str            # Bot 的发送方法
+    extract: Callable[[Any], Tuple[str, str]]  # 附件 -> (文件名, MIME 类型)
+    message_filter: Any         # 处理器使用的消息过滤器
+    input_media: Optional[Type] = None  # 可以放入相册时对应的 InputMedia 类型
+    shows_file_name: bool = False       # 消息中会显示文件名（批量复制时无需补写标题）
+    has_caption: bool = True            # 发送方法支持 caption
+
+
+def _named(default_name: str, default_mime: str) -> Callable[[Any], Tuple[str, str]]:
+    """提取函数：优先使用附件自带的文件名和 MIME 类型，default_name 中的 {} 替换为 file_unique_id"""
+    def extract(attachment) -> Tuple[str, str]:
+        file_name = getattr(attachment, 'file_name', None) or default_name.format(attachment.file_unique_id)
+        return file_name, getattr(attachment, 'mime_type', None) or default_mime
+    return extract
+
+
+def _fixed(default_name: str, mime_type: str) -> Callable[[Any], Tuple[str, str]]:
+    """提取函数：固定的文件名格式和 MIME 类型"""
+    def extract(attachment) -> Tuple[str, str]:
+        return default_name.format(attachment.file_unique_id), mime_type
+    return extract
+
+
+def _extract_sticker(sticker: Sticker) -> Tuple[str, str]:
+    if sticker.is_animated:
+        return f'贴纸_{sticker.file_unique_id}.tgs', 'application/x-tgsticker'
+    if sticker.is_video:
+        return f'贴纸_{sticker.file_unique_id}.webm', 'video/webm'
+    return f'贴纸_{sticker.file_unique_id}.webp', 'image/webp'
+
+
+# 按检查顺序排列：动图消息同时带有 document，需要先于文档检查
+MEDIA_KINDS: Dict[str, MediaKind] = {kind.file_type: kind for kind in (
+    MediaKind('animation', '动图', 'send_animation', _named('动图_{}.mp4', 'video/mp4'), filters.ANIMATION),
+    MediaKind('document', '文档', 'send_document', _named('未知文档', 'application/octet-stream'),
+              filters.Document.ALL, InputMediaDocument, shows_file_name=True),
+    MediaKind('photo', '图片', 'send_photo', _fixed('图片_{}.jpg', 'image/jpeg'),
+              filters.PHOTO, InputMediaPhoto),
+    MediaKind('video', '视频', 'send_video', _named('视频_{}.mp4', 'video/mp4'),
+              filters.VIDEO, InputMediaVideo),
+    MediaKind('audio', '音频', 'send_audio', _named('音频_{}.mp3', 'audio/mpeg'),
+              filters.AUDIO, InputMediaAudio, shows_file_name=True),
+    MediaKind('voice', '语音', 'send_voice', _fixed('语音_{}.ogg', 'audio/ogg'), filters.VOICE),
+    MediaKind('video_note', '视频消息', 'send_video_note', _fixed('视频消息_{}.mp4', 'video/mp4'),
+              filters.VIDEO_NOTE, has_caption=False),
+    MediaKind('sticker', '贴纸', 'send_sticker', _extract_sticker, filters.Sticker.ALL, has_caption=False)
+)}
+
+# 所有支持的媒体类型的消息过滤器
+MEDIA_FILTER = reduce(or_, (kind.message_filter for kind in MEDIA_KINDS.values()))
+
+
+def get_attachment(message: Message) -> Tuple[Optional[MediaKind], Any]:
+    """
+    获取消息的附件及其媒体类型（按表中的顺序读取消息属性，比 Message.effective_attachment 检查全部附件类型快）
+
+    Returns:
+        Tuple[Optional[MediaKind], Any]: (媒体类型, 附件)，不支持的消息返回 (None, None)
+    """
+    for kind in MEDIA_KINDS.values():
+        attachment = getattr(message, kind.file_type)
+        if attachment:
+            # 图片取最高质量的尺寸
+            return kind, attachment[-1] if kind.file_type == 'photo' else attachment
+    return None, None
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+指标模块
+进程内的计数器、直方图和仪表，以 Prometheus 文本格式导出（/metrics）
+
+所有更新都在事件循环线程中进行，不需要加锁；记录一次指标只是一次字典查找和加法
+"""
+
+import math
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Prometheus 文本格式的 Content-Type
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 耗时直方图的默认分桶（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# 文件大小直方图的分桶（字节）：1KB ~ 1GB 每档乘 4，再加 2GB（本地 Bot API 服务器的文件上限）
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(11)) + (2 * 1024 ** 3,)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """指标基类"""
+
+    __slots__ = ('name', 'description', 'labelnames')
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> List[str]:
+        """导出的样本行"""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """只增不减的计数器"""
+
+    __slots__ = ('_values',)
+
+    kind = 'counter'
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, description, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        """计数加 amount，labels 按 labelnames 的顺序给出"""
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in self._values.items()
+        ]
+
+
+class Gauge(Metric):
+    """可增可减的仪表；设置了读取函数时在导出时取值，不需要在业务代码中更新"""
+
+    __slots__ = ('_value', '_function')
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, description: str, function: Optional[Callable[[], float]] = None):
+        super().__init__(name, description)
+        self._value = 0.0
+        self._function = function
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._value -= amount
+
+    def value(self) -> float:
+        return self._function() if self._function is not None else self._value
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {_format_value(self.value())}"]
+
+
+class Histogram(Metric):
+    """直方图：每次记录只在对应的分桶上加一，导出时再累加"""
+
+    __slots__ = ('buckets', '_series')
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签 -> [各分桶计数（最后一个为 +Inf）, 总和]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        """记录一个观测值"""
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class BotMetrics:
+    """上传流水线的指标"""
+
+    def __init__(self, queue_depth: Callable[[], float], jobs_in_flight: Callable[[], float]):
+        """
+        初始化指标
+
+        Args:
+            queue_depth: 读取转发队列长度
+            jobs_in_flight: 读取正在处理的转发任务数
+        """
+        self.updates = Counter('tgbot_updates_total', 'Updates received, by update type', ('type',))
+        self.forwards = Counter(
+            'tgbot_forwards_total', 'Files forwarded, by file type, destination and outcome',
+            ('file_type', 'destination', 'outcome')
+        )
+        self.retries = Counter('tgbot_retries_total', 'Bot API retries, by exception class', ('operation', 'exception'))
+        self.process_file_seconds = Histogram('tgbot_process_file_seconds', 'Time spent in FileProcessor.process_file')
+        self.forward_seconds = Histogram(
+            'tgbot_forward_seconds', 'Latency of one forward request to a destination, including retries', ('method',)
+        )
+        self.file_size_bytes = Histogram(
+            'tgbot_file_size_bytes', 'Size of accepted files', ('file_type',), buckets=SIZE_BUCKETS
+        )
+        self.queue_depth = Gauge('tgbot_forward_queue_depth', 'Forward jobs waiting in the queue', queue_depth)
+        self.jobs_in_flight = Gauge('tgbot_forward_jobs_in_flight', 'Forward jobs being processed', jobs_in_flight)
+        self.sends_in_flight = Gauge('tgbot_sends_in_flight', 'Forward requests waiting for the Bot API')
+
+    def render(self) -> str:
+        """导出 Prometheus 文本格式"""
+        return '\n'.join(
+            metric.render() for metric in vars(self).values() if isinstance(metric, Metric)
+        ) + '\n'
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+转发发件箱模块
+转发任务在回复用户之前写入 SQLite（WAL 模式），发送成功后标记完成，启动时重放未完成任务
+"""
+
+import os
+import json
+import time
+import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+
+
+class Outbox:
+    """基于 SQLite 的持久化发件箱"""
+
+    STATUS_PENDING = 'pending'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    def __init__(self, path: str):
+        """
+        初始化发件箱
+
+        Args:
+            path: SQLite 数据库文件路径
+        """
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def open(self) -> None:
+        """打开数据库并建表"""
+        if self._conn is not None:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS forward_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id INTEGER NOT NULL,
+                message_id INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                UNIQUE (chat_id, message_id)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_forward_jobs_status ON forward_jobs (status)"
+        )
+        logger.info(f"发件箱已打开: {self.path}")
+
+    def close(self) -> None:
+        """关闭数据库"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def add(self, chat_id: int, message_id: int, payload: Dict[str, Any]) -> Optional[int]:
+        """
+        写入转发任务
+
+        同一条上传消息（chat_id + message_id）只会写入一次，重复投递的更新会被忽略
+
+        Args:
+            chat_id: 上传消息所在聊天ID
+            message_id: 上传消息ID
+            payload: 任务内容（可 JSON 序列化）
+
+        Returns:
+            int: 任务ID，如果任务已存在则返回 None
+        """
+        now = time.time()
+        cursor = self._conn.execute(
+            "INSERT OR IGNORE INTO forward_jobs "
+            "(chat_id, message_id, payload, status, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (chat_id, message_id, json.dumps(payload, ensure_ascii=False), self.STATUS_PENDING, now, now)
+        )
+        return cursor.lastrowid if cursor.rowcount else None
+
+    def update(self, job_id: int, payload: Dict[str, Any]) -> None:
+        """更新未完成任务的内容（如记录部分目标已发送）"""
+        self._conn.execute(
+            "UPDATE forward_jobs SET payload = ?, updated_at = ? WHERE id = ?",
+            (json.dumps(payload, ensure_ascii=False), time.time(), job_id)
+        )
+
+    def mark_done(self, job_id: int) -> None:
+        """标记任务已完成"""
+        self._set_status(job_id, self.STATUS_DONE)
+
+    def mark_failed(self, job_id: int, error: str) -> None:
+        """标记任务永久失败（不再重放）"""
+        self._set_status(job_id, self.STATUS_FAILED, error)
+
+    def _set_status(self, job_id: int, status: str, error: Optional[str] = None) -> None:
+        """更新任务状态"""
+        self._conn.execute(
+            "UPDATE forward_jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+            (status, error, time.time(), job_id)
+        )
+
+    def pending(self) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        获取所有未完成任务（按写入顺序），内容无法解析的任务标记为失败并跳过
+
+        Returns:
+            List: (任务ID, 任务内容) 列表
+        """
+        rows = self._conn.execute(
+            "SELECT id, payload FROM forward_jobs WHERE status = ? ORDER BY id",
+            (self.STATUS_PENDING,)
+        ).fetchall()
+        pending = []
+        for job_id, payload in rows:
+            try:
+                pending.append((job_id, json.loads(payload)))
+            except ValueError as e:
+                logger.error(f"转发任务 {job_id} 内容无法解析，已标记为失败: {str(e)}")
+                self.mark_failed(job_id, f"内容无法解析: {str(e)}")
+        return pending
+
+    def purge(self, older_than_days: float) -> int:
+        """
+        清理已完成/已失败的旧任务
+
+        Args:
+            older_than_days: 清理多少天之前的任务
+
+        Returns:
+            int: 清理的任务数
+        """
+        cutoff = time.time() - older_than_days * 86400
+        cursor = self._conn.execute(
+            "DELETE FROM forward_jobs WHERE status != ? AND updated_at < ?",
+            (self.STATUS_PENDING, cutoff)
+        )
+        return cursor.rowcount
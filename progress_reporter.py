@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进度汇报模块
+每个用户会话只保留一条状态消息，原地编辑并做防抖，状态消息的发送量与上传文件数量无关
+"""
+
+import time
+import asyncio
+from typing import Dict, Optional
+from telegram.error import BadRequest, TelegramError
+from loguru import logger
+
+
+# 编辑失败时只有这些 BadRequest 表示状态消息已不可用，需要重新发送一条
+UNEDITABLE_ERRORS = ('message to edit not found', "message can't be edited", 'message_id_invalid')
+
+
+class ProgressSession:
+    """单个聊天的一次上传会话"""
+
+    __slots__ = (
+        'chat_id', 'reply_to_message_id', 'status_message_id', 'queued', 'forwarded',
+        'skipped', 'failed', 'last_title', 'last_note', 'last_text', 'last_edit',
+        'last_activity', 'flush_task'
+    )
+
+    def __init__(self, chat_id: int, reply_to_message_id: Optional[int]):
+        self.chat_id = chat_id
+        self.reply_to_message_id = reply_to_message_id
+        self.status_message_id: Optional[int] = None
+        self.queued = 0
+        self.forwarded = 0
+        self.skipped = 0
+        self.failed = 0
+        self.last_title = ''
+        self.last_note = ''
+        self.last_text = ''
+        self.last_edit = 0.0
+        self.last_activity = time.monotonic()
+        self.flush_task: Optional[asyncio.Task] = None
+
+    @property
+    def finished(self) -> int:
+        """已结束（转发/跳过/失败）的文件数"""
+        return self.forwarded + self.skipped + self.failed
+
+    @property
+    def completed(self) -> bool:
+        """会话中的文件是否全部处理完毕"""
+        return self.finished >= self.queued
+
+    def render(self) -> str:
+        """生成状态消息文本"""
+        lines = ["文件转发进度" + ("（已完成）" if self.completed else "")]
+        lines.append(f"排队中：{max(0, self.queued - self.finished)}")
+        lines.append(f"已转发：{self.forwarded}")
+        if self.skipped:
+            lines.append(f"已跳过（重复）：{self.skipped}")
+        if self.failed:
+            lines.append(f"失败：{self.failed}")
+        if self.last_title:
+            lines.append(f"\n最近：{self.last_title}")
+        if self.last_note:
+            lines.append(self.last_note)
+        return "\n".join(lines)
+
+
+class ProgressReporter:
+    """按聊天汇总上传进度，防抖编辑状态消息"""
+
+    # 会话数超过此值时清理已结束的会话
+    MAX_SESSIONS = 1024
+
+    def __init__(self, interval: float = 3.0, session_timeout: float = 60.0):
+        """
+        初始化进度汇报器
+
+        Args:
+            interval: 同一状态消息两次编辑之间的最小间隔（秒）
+            session_timeout: 会话全部完成并空闲超过此时间后，下次上传开启新的状态消息
+        """
+        self.interval = interval
+        self.session_timeout = session_timeout
+        self._bot = None
+        self._sessions: Dict[int, ProgressSession] = {}
+
+    def attach(self, bot) -> None:
+        """设置用于发送/编辑状态消息的 bot"""
+        self._bot = bot
+
+    def _session(self, chat_id: int, reply_to_message_id: Optional[int] = None) -> ProgressSession:
+        """获取聊天的当前会话，必要时开启新会话"""
+        now = time.monotonic()
+        session = self._sessions.get(chat_id)
+        if session is None or (session.completed and now - session.last_activity > self.session_timeout):
+            self._prune(now)
+            session = self._sessions[chat_id] = ProgressSession(chat_id, reply_to_message_id)
+        session.last_activity = now
+        return session
+
+    def _prune(self, now: float) -> None:
+        """会话过多时清理已完成且空闲的会话"""
+        if len(self._sessions) <= self.MAX_SESSIONS:
+            return
+        for chat_id in [c for c, s in self._sessions.items()
+                        if s.completed and now - s.last_activity > self.session_timeout]:
+            del self._sessions[chat_id]
+
+    def queued(self, chat_id: int, reply_to_message_id: Optional[int], count: int = 1, title: str = '') -> None:
+        """文件已加入转发队列"""
+        session = self._session(chat_id, reply_to_message_id)
+        session.queued += count
+        if title:
+            session.last_title = title
+        self._schedule(session)
+
+    def forwarded(self, chat_id: int, count: int = 1, title: str = '') -> None:
+        """文件已转发"""
+        session = self._session(chat_id)
+        session.forwarded += count
+        if title:
+            session.last_title = title
+        session.last_note = ''
+        self._schedule(session)
+
+    def skipped(self, chat_id: int, count: int = 1, note: str = '') -> None:
+        """重复文件已跳过"""
+        session = self._session(chat_id)
+        session.skipped += count
+        session.last_note = note
+        self._schedule(session)
+
+    def retrying(self, chat_id: int, note: str) -> None:
+        """文件仍在重试（不改变计数，只更新提示）"""
+        session = self._session(chat_id)
+        session.last_note = note
+        self._schedule(session)
+
+    def failed(self, chat_id: int, count: int = 1, reason: str = '', queued: bool = True) -> None:
+        """
+        文件处理失败
+
+        Args:
+            chat_id: 聊天ID
+            count: 失败的文件数
+            reason: 失败原因
+            queued: 文件是否已计入排队数（入队前失败的文件传 False）
+        """
+        session = self._session(chat_id)
+        if not queued:
+            session.queued += count
+        session.failed += count
+        if reason:
+            session.last_note = f"失败原因：{reason}"
+        self._schedule(session)
+
+    def _schedule(self, session: ProgressSession) -> None:
+        """安排一次刷新（同一会话同时最多一个刷新任务）"""
+        if self._bot is None or (session.flush_task and not session.flush_task.done()):
+            return
+        session.flush_task = asyncio.create_task(self._flush(session))
+
+    async def _flush(self, session: ProgressSession) -> None:
+        """等待到允许编辑的时间后刷新状态消息，期间的更新合并为一次编辑"""
+        while True:
+            delay = session.last_edit + self.interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            text = session.render()
+            if text == session.last_text:
+                return
+
+            published = await self._publish(session, text)
+            session.last_edit = time.monotonic()
+            if not published:
+                return
+
+    async def _publish(self, session: ProgressSession, text: str) -> bool:
+        """发送或编辑状态消息，返回是否成功"""
+        try:
+            if session.status_message_id is not None:
+                try:
+                    await self._bot.edit_message_text(
+                        chat_id=session.chat_id,
+                        message_id=session.status_message_id,
+                        text=text
+                    )
+                    session.last_text = text
+                    return True
+                except BadRequest as e:
+                    error = str(e).lower()
+                    if 'not modified' in error:
+                        session.last_text = text
+                        return True
+                    if not any(reason in error for reason in UNEDITABLE_ERRORS):
+                        raise
+                    # 状态消息已被删除或不能再编辑，重新发送一条
+                    logger.warning(f"编辑状态消息失败，重新发送: {str(e)}")
+
+            message = await self._bot.send_message(
+                chat_id=session.chat_id,
+                text=text,
+                reply_to_message_id=session.reply_to_message_id,
+                allow_sending_without_reply=True
+            )
+            session.status_message_id = message.message_id
+            session.last_text = text
+            return True
+        except TelegramError as e:
+            # 网络错误等：不重新发送（避免重复的状态消息），保留未发布的状态，下次更新时再尝试
+            logger.warning(f"发送状态消息失败: {str(e)}")
+            return False
+
+    async def flush_all(self) -> None:
+        """立即发布所有会话的最新状态（关闭时使用）"""
+        for task in [s.flush_task for s in self._sessions.values() if s.flush_task]:
+            task.cancel()
+        for session in list(self._sessions.values()):
+            text = session.render()
+            if text != session.last_text:
+                await self._publish(session, text)
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+限流模块
+基于令牌桶的 Bot API 限流器，支持全局/群组/话题三级限流，并遵循服务器返回的 retry_after
+"""
+
+import time
+import asyncio
+from typing import Any, Callable, Coroutine, Dict, Optional, Tuple, Union
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+from loguru import logger
+
+
+class TokenBucket:
+    """令牌桶（预约式：令牌可以透支，透支部分换算成等待时间）"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated_at', 'blocked_until')
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        初始化令牌桶
+
+        Args:
+            rate: 每秒补充的令牌数
+            capacity: 桶容量（允许的突发数量）
+        """
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        """按经过的时间补充令牌"""
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def reserve(self, now: float) -> float:
+        """
+        预约一个令牌
+
+        Args:
+            now: 当前时间（time.monotonic）
+
+        Returns:
+            float: 需要等待的秒数，0 表示可以立即发送
+        """
+        self._refill(now)
+        self.tokens -= 1
+        delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(delay, self.blocked_until - now)
+
+    def block(self, now: float, seconds: float) -> None:
+        """服务器要求等待时，暂停此桶并清空令牌"""
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = min(self.tokens, 0.0)
+        self.updated_at = max(self.updated_at, now)
+
+    def is_idle(self, now: float) -> bool:
+        """桶是否已回满（可以回收）"""
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.blocked_until
+
+
+class TelegramRateLimiter(BaseRateLimiter):
+    """
+    Telegram Bot API 限流器
+
+    通过 Application.builder().rate_limiter(...) 安装后，机器人发出的所有请求都会经过此限流器：
+    - 全局桶：所有带 chat_id 的请求共享（默认 30 条/秒）
+    - 群组桶：每个群组/频道一个（默认 20 条/分钟）
+    - 私聊桶：每个私聊一个（默认 1 条/秒）
+    - 话题桶：每个群组话题一个（默认关闭）
+    遇到 RetryAfter 时暂停对应的桶，等待服务器指定的时间后重试
+    """
+
+    # 桶数量超过此值时回收空闲桶
+    MAX_IDLE_BUCKETS = 512
+
+    def __init__(
+        self,
+        global_per_second: float = 30,
+        group_per_minute: float = 20,
+        private_per_second: float = 1,
+        topic_per_minute: float = 0,
+        max_retries: int = 3
+    ):
+        """
+        初始化限流器
+
+        Args:
+            global_per_second: 全局每秒请求数
+            group_per_minute: 每个群组每分钟消息数
+            private_per_second: 每个私聊每秒消息数
+            topic_per_minute: 每个话题每分钟消息数，0 表示不单独限制话题
+            max_retries: 遇到 RetryAfter 时的最大重试次数
+        """
+        self.global_per_second = global_per_second
+        self.group_per_minute = group_per_minute
+        self.private_per_second = private_per_second
+        self.topic_per_minute = topic_per_minute
+        self.max_retries = max_retries
+
+        self._global_bucket = TokenBucket(global_per_second, global_per_second)
+        self._chat_buckets: Dict[Union[int, str], TokenBucket] = {}
+        self._topic_buckets: Dict[Tuple[Union[int, str], int], TokenBucket] = {}
+
+    async def initialize(self) -> None:
+        """无需初始化"""
+
+    async def shutdown(self) -> None:
+        """清空所有桶"""
+        self._chat_buckets.clear()
+        self._topic_buckets.clear()
+
+    def _new_chat_bucket(self, chat_id: Union[int, str]) -> TokenBucket:
+        """根据聊天类型创建桶（负数ID或 @用户名 为群组/频道）"""
+        if isinstance(chat_id, str) or chat_id < 0:
+            return TokenBucket(self.group_per_minute / 60, self.group_per_minute)
+        return TokenBucket(self.private_per_second, self.private_per_second)
+
+    def _get_bucket(self, buckets: Dict, key, factory: Callable[[], TokenBucket], now: float) -> TokenBucket:
+        """获取（必要时创建）指定键的桶，数量过多时回收空闲桶"""
+        bucket = buckets.get(key)
+        if bucket is None:
+            if len(buckets) > self.MAX_IDLE_BUCKETS:
+                for idle_key in [k for k, b in buckets.items() if b.is_idle(now)]:
+                    del buckets[idle_key]
+            bucket = buckets[key] = factory()
+        return bucket
+
+    def _buckets_for(self, chat_id: Optional[Union[int, str]], thread_id: Optional[int], now: float):
+        """返回请求需要经过的所有桶"""
+        if chat_id is None:
+            return []
+
+        buckets = [
+            self._global_bucket,
+            self._get_bucket(self._chat_buckets, chat_id, lambda: self._new_chat_bucket(chat_id), now)
+        ]
+        if thread_id and self.topic_per_minute > 0:
+            buckets.append(self._get_bucket(
+                self._topic_buckets,
+                (chat_id, thread_id),
+                lambda: TokenBucket(self.topic_per_minute / 60, self.topic_per_minute),
+                now
+            ))
+        return buckets
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Any]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[int],
+    ) -> Any:
+        """
+        限流后执行请求
+
+        Args:
+            callback: 实际发送请求的协程函数
+            args: callback 的位置参数
+            kwargs: callback 的关键字参数
+            endpoint: Bot API 方法名
+            data: 请求参数
+            rate_limit_args: 本次请求的最大重试次数（可选）
+        """
+        max_retries = rate_limit_args if rate_limit_args is not None else self.max_retries
+        chat_id = _chat_key(data.get('chat_id'))
+        thread_id = _chat_key(data.get('message_thread_id'))
+
+        for attempt in range(max_retries + 1):
+            now = time.monotonic()
+            buckets = self._buckets_for(chat_id, thread_id, now)
+            delay = max(
+                (bucket.reserve(now) for bucket in buckets),
+                default=self._global_bucket.blocked_until - now
+            )
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                retry_after = float(e.retry_after)
+                if attempt >= max_retries:
+                    logger.error(f"{endpoint} 触发限流，已重试 {max_retries} 次，放弃: {str(e)}")
+                    raise
+
+                # 群组/私聊的限流只暂停对应聊天，其它请求暂停全局
+                now = time.monotonic()
+                target = buckets[1] if len(buckets) > 1 else self._global_bucket
+                target.block(now, retry_after)
+                logger.warning(f"{endpoint} 触发限流 (chat_id={chat_id})，{retry_after:.0f} 秒后重试")
+
+        return None
+
+
+def _chat_key(value) -> Optional[Union[int, str]]:
+    """将 chat_id/话题ID 统一转换为整数（@用户名 形式保持字符串）"""
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return str(value)
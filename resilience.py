@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+容错模块
+指数退避（带抖动）、Bot API 熔断器和延迟重试调度，重试通过定时器安排，不在更新处理中等待
+"""
+
+import time
+import random
+import asyncio
+from typing import Any, Awaitable, Callable, Optional, Set
+from telegram.error import NetworkError
+from loguru import logger
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """
+    计算第 attempt 次重试前的等待时间（指数退避 + 抖动）
+
+    取上限的一半作为固定部分，另一半随机，既保证退避又避免大量重试在同一时刻发出
+
+    Args:
+        attempt: 已失败的次数（从 0 开始）
+        base: 初始等待时间（秒）
+        cap: 最大等待时间（秒）
+    """
+    delay = min(cap, base * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class CircuitOpenError(NetworkError):
+    """熔断器打开期间直接拒绝请求（按网络错误处理，稍后重试）"""
+
+
+class CircuitBreaker:
+    """
+    Bot API 熔断器
+
+    连续失败达到阈值后打开，打开期间拒绝请求；冷却时间过后放行一个探测请求（半开），
+    探测成功则关闭，失败则重新打开并把冷却时间加倍（不超过上限）。
+    短暂故障在约 reset_timeout 秒后即可恢复，长时间故障时探测请求逐渐变少
+    """
+
+    __slots__ = ('failure_threshold', 'reset_timeout', 'max_reset_timeout', '_timeout',
+                 '_failures', '_opened_at', '_probe_at')
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 1.0, max_reset_timeout: float = 30.0):
+        """
+        初始化熔断器
+
+        Args:
+            failure_threshold: 连续失败多少次后打开
+            reset_timeout: 首次打开后多久放行探测请求（秒）
+            max_reset_timeout: 探测连续失败时冷却时间的上限（秒）
+        """
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max(reset_timeout, max_reset_timeout)
+        self._timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        """closed / open / half_open"""
+        if self._opened_at is None:
+            return 'closed'
+        return 'half_open' if self._probe_at is not None else 'open'
+
+    @property
+    def retry_in(self) -> float:
+        """距离允许探测还有多久（秒），未打开时为 0"""
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self._opened_at + self._timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        """是否允许发出请求（半开状态只放行一个探测请求）"""
+        if self._opened_at is None:
+            return True
+
+        now = time.monotonic()
+        if now - self._opened_at < self._timeout:
+            return False
+        # 探测请求没有回报结果（例如被取消）时，超时后允许新的探测（探测请求本身可能很慢，按上限计算）
+        if self._probe_at is not None and now - self._probe_at < self.max_reset_timeout:
+            return False
+        self._probe_at = now
+        return True
+
+    def record_success(self) -> None:
+        """请求成功（或服务器正常响应）"""
+        if self._opened_at is not None:
+            logger.info("Bot API 已恢复，熔断器关闭")
+        self._failures = 0
+        self._opened_at = None
+        self._probe_at = None
+        self._timeout = self.reset_timeout
+
+    def record_failure(self) -> None:
+        """请求因网络错误失败"""
+        self._failures += 1
+        if self._probe_at is not None:
+            # 探测失败：冷却时间加倍后重新打开
+            self._timeout = min(self.max_reset_timeout, self._timeout * 2)
+            self._opened_at = time.monotonic()
+            self._probe_at = None
+        elif self._opened_at is None and self._failures >= self.failure_threshold:
+            logger.warning(f"Bot API 连续失败 {self._failures} 次，熔断 {self._timeout} 秒")
+            self._opened_at = time.monotonic()
+
+
+class RetryScheduler:
+    """延迟重试调度器：用事件循环的定时器安排重试，等待期间不占用任何协程"""
+
+    def __init__(self):
+        self._timers: Set[asyncio.TimerHandle] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def pending(self) -> int:
+        """等待中和执行中的重试数量"""
+        return len(self._timers) + len(self._tasks)
+
+    def schedule(self, delay: float, retry: Callable[[], Awaitable[Any]]) -> None:
+        """
+        安排一次重试
+
+        Args:
+            delay: 延迟（秒）
+            retry: 到期后调用的协程函数
+        """
+        loop = asyncio.get_running_loop()
+        timer = None
+
+        def fire():
+            self._timers.discard(timer)
+            task = loop.create_task(self._run(retry))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        timer = loop.call_later(delay, fire)
+        self._timers.add(timer)
+
+    async def _run(self, retry: Callable[[], Awaitable[Any]]) -> None:
+        """执行重试"""
+        try:
+            await retry()
+        except Exception as e:
+            logger.error(f"执行重试失败: {str(e)}")
+
+    async def cancel_all(self) -> None:
+        """取消所有等待中和执行中的重试（关闭时使用）"""
+        for timer in self._timers:
+            timer.cancel()
+        self._timers.clear()
+        for task in self._tasks:
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
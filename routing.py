@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+路由规则模块
+按文件类型、扩展名、MIME 类型、大小、说明文字或上传者选择转发目标，
+规则从 bot_config.json 的 ROUTING_RULES 读取，编译为扩展名哈希表 + 预编译正则，文件修改后自动重新加载
+"""
+
+import os
+import re
+import json
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from loguru import logger
+
+from destinations import Destination
+from media import FileInfo
+
+
+class RouteRule:
+    """编译后的单条路由规则（扩展名条件由 RoutingTable 的哈希表处理）"""
+
+    __slots__ = (
+        'index', 'name', 'destination', 'file_types', 'mime_types', 'mime_prefixes',
+        'min_size', 'max_size', 'caption_pattern', 'user_ids'
+    )
+
+    def __init__(self, index: int, spec: Dict[str, Any], default_chat_id: int):
+        """
+        编译规则
+
+        Args:
+            index: 规则序号（越小优先级越高）
+            spec: bot_config.json 中的规则定义
+            default_chat_id: 规则未指定 chat_id 时使用的群组
+
+        Raises:
+            ValueError: 规则格式错误
+        """
+        self.index = index
+        self.name = str(spec.get('name') or f"规则{index + 1}")
+
+        topic_id = spec.get('topic_id')
+        self.destination = Destination(
+            int(spec.get('chat_id', default_chat_id)),
+            int(topic_id) if topic_id not in (None, '') else None,
+            self.name
+        )
+
+        self.file_types = frozenset(spec.get('file_types') or ()) or None
+
+        mime_types = [str(m).lower() for m in spec.get('mime_types') or ()]
+        self.mime_types = frozenset(m for m in mime_types if not m.endswith('/*')) or None
+        self.mime_prefixes = tuple(m[:-1] for m in mime_types if m.endswith('/*')) or None
+
+        self.min_size = float(spec.get('min_size_mb', 0)) * 1024 * 1024
+        max_size_mb = spec.get('max_size_mb')
+        self.max_size = float(max_size_mb) * 1024 * 1024 if max_size_mb is not None else None
+
+        caption_regex = spec.get('caption_regex')
+        self.caption_pattern = re.compile(caption_regex) if caption_regex else None
+
+        self.user_ids = frozenset(int(u) for u in spec.get('user_ids') or ()) or None
+
+    def matches(self, result: FileInfo, user_id: Optional[int]) -> bool:
+        """检查文件是否满足扩展名以外的全部条件"""
+        if self.file_types is not None and result.file_type not in self.file_types:
+            return False
+
+        if self.mime_types is not None or self.mime_prefixes is not None:
+            mime_type = (result.mime_type or '').lower()
+            if not ((self.mime_types and mime_type in self.mime_types)
+                    or (self.mime_prefixes and mime_type.startswith(self.mime_prefixes))):
+                return False
+
+        file_size = result.file_size or 0
+        if file_size < self.min_size or (self.max_size is not None and file_size > self.max_size):
+            return False
+
+        if self.user_ids is not None and user_id not in self.user_ids:
+            return False
+
+        if self.caption_pattern is not None and not self.caption_pattern.search(result.original_caption or ''):
+            return False
+
+        return True
+
+
+class RoutingTable:
+    """
+    编译后的路由表
+
+    每个扩展名预先合并出按优先级排序的候选规则，查找时只需一次哈希查询，
+    再依次检查候选规则的其余条件，第一条匹配的规则生效
+    """
+
+    def __init__(self, rules: List[RouteRule], rule_extensions: List[Optional[Iterable[str]]]):
+        """
+        Args:
+            rules: 编译后的规则（按优先级排序）
+            rule_extensions: 每条规则限定的扩展名，None 表示不限
+        """
+        self.rules = rules
+        by_extension: Dict[str, List[RouteRule]] = {}
+        any_extension: List[RouteRule] = []
+        for rule, extensions in zip(rules, rule_extensions):
+            if extensions is None:
+                any_extension.append(rule)
+            else:
+                for ext in extensions:
+                    by_extension.setdefault(ext, []).append(rule)
+
+        self._any_extension: Tuple[RouteRule, ...] = tuple(any_extension)
+        self._by_extension: Dict[str, Tuple[RouteRule, ...]] = {
+            ext: tuple(sorted(candidates + any_extension, key=lambda r: r.index))
+            for ext, candidates in by_extension.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    @classmethod
+    def compile(
+        cls,
+        specs: List[Dict[str, Any]],
+        supported_types: Dict[str, List[str]],
+        default_chat_id: int
+    ) -> 'RoutingTable':
+        """
+        编译规则列表，格式错误的规则会被忽略
+
+        Args:
+            specs: 规则定义列表
+            supported_types: FileProcessor.supported_types，规则的 categories 展开为其中的扩展名
+            default_chat_id: 规则未指定 chat_id 时使用的群组
+        """
+        rules = []
+        rule_extensions = []
+        for spec in specs:
+            try:
+                rule = RouteRule(len(rules), spec, default_chat_id)
+                extensions = None
+                if spec.get('extensions') or spec.get('categories'):
+                    extensions = {
+                        ext.lower() if ext.startswith('.') else f".{ext.lower()}"
+                        for ext in spec.get('extensions') or ()
+                    }
+                    for category in spec.get('categories') or ():
+                        if category not in supported_types:
+                            raise ValueError(f"未知的文件分类: {category}")
+                        extensions.update(supported_types[category])
+            except (TypeError, ValueError, re.error) as e:
+                logger.warning(f"路由规则格式错误，已忽略: {spec} ({str(e)})")
+                continue
+            rules.append(rule)
+            rule_extensions.append(extensions)
+        return cls(rules, rule_extensions)
+
+    def route(self, result: FileInfo, user_id: Optional[int] = None) -> Optional[RouteRule]:
+        """返回第一条匹配的规则，没有匹配时返回 None"""
+        ext = os.path.splitext(result.file_name or '')[1].lower()
+        for rule in self._by_extension.get(ext, self._any_extension):
+            if rule.matches(result, user_id):
+                return rule
+        return None
+
+
+class RoutingRules:
+    """从配置文件加载路由表，文件修改后自动重新编译"""
+
+    def __init__(
+        self,
+        path: str,
+        supported_types: Dict[str, List[str]],
+        default_chat_id: int,
+        reload_interval: float = 5.0
+    ):
+        """
+        初始化路由规则
+
+        Args:
+            path: 配置文件路径（读取其中的 ROUTING_RULES）
+            supported_types: FileProcessor.supported_types
+            default_chat_id: 规则未指定 chat_id 时使用的群组
+            reload_interval: 检查配置文件是否修改的最小间隔（秒）
+        """
+        self.path = path
+        self.supported_types = supported_types
+        self.default_chat_id = default_chat_id
+        self.reload_interval = reload_interval
+        self.table = RoutingTable([], [])
+        self._mtime: Optional[float] = None
+        self._checked_at = float('-inf')
+
+    def route(self, result: FileInfo, user_id: Optional[int] = None) -> Optional[Destination]:
+        """
+        为文件选择转发目标
+
+        Returns:
+            Destination: 匹配规则的目标，没有匹配时返回 None（使用默认话题）
+        """
+        self.reload_if_changed()
+        rule = self.table.route(result, user_id)
+        return rule.destination if rule is not None else None
+
+    def reload_if_changed(self) -> None:
+        """配置文件修改后重新编译路由表（按间隔节流，避免每次转发都访问磁盘）"""
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+
+        try:
+            specs = []
+            if mtime is not None:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    specs = json.load(f).get('ROUTING_RULES') or []
+            table = RoutingTable.compile(specs, self.supported_types, self.default_chat_id)
+        except (OSError, ValueError, AttributeError) as e:
+            # 保留旧的路由表，等待下次修改
+            logger.warning(f"加载路由规则失败，继续使用当前规则: {str(e)}")
+            self._mtime = mtime
+            return
+
+        self._mtime = mtime
+        if len(table) or len(self.table):
+            logger.info(f"已加载 {len(table)} 条路由规则: {self.path}")
+        self.table = table
@@ -2,6 +2,9 @@
 # -*- coding: utf-8 -*-
 """
 超简单稳定版机器人启动脚本
+
+在处理器中直接转发，不使用发件箱：转发失败或进程退出时文件不会重新转发，
+需要至少转发一次的保证时使用 start_ultra_stable.py
 """
 
 import os
@@ -11,6 +14,7 @@ from telegram import Update
 from telegram.error import NetworkError, TimedOut, Conflict
 from config import Config
 from file_processor import FileProcessor
+from media import MEDIA_FILTER, MEDIA_KINDS, FileInfo, get_attachment
 from utils import setup_logging, is_user_allowed, format_file_info
 from loguru import logger
 
@@ -230,22 +234,23 @@ async def handle_file_upload(update: Update, context, file_type: str) -> None:
         processing_msg = await message.reply_text(f"正在处理{file_type}...")
         
         # 处理文件
-        result = await file_processor.process_file(message, config)
+        processed = await file_processor.process_file(message, config)
         
-        if result['success']:
+        if processed.success:
+            result = processed.file
             # 转发到目标群组
             await forward_to_group(result, user, file_type, context)
             
             # 更新处理完成消息
             await processing_msg.edit_text(
                 f"{file_type}处理完成！\n"
-                f"标题：{result['title']}\n"
+                f"标题：{result.title}\n"
                 f"已转发到目标群组"
             )
             
-            logger.info(f"成功处理{file_type}: {result['title']}")
+            logger.info(f"成功处理{file_type}: {result.title}")
         else:
-            await processing_msg.edit_text(f"处理{file_type}失败：{result['error']}")
+            await processing_msg.edit_text(f"处理{file_type}失败：{processed.error}")
             
     except Exception as e:
         logger.error(f"处理文件上传时发生错误: {str(e)}")
@@ -254,14 +259,12 @@ async def handle_file_upload(update: Update, context, file_type: str) -> None:
         except:
             pass
 
-async def forward_to_group(result: dict, user, file_type: str, context) -> None:
+async def forward_to_group(result: FileInfo, user, file_type: str, context) -> None:
     """转发文件到目标群组"""
-    caption = format_file_info(result, user, file_type)
-    
-    send_params = {
-        'chat_id': config.TARGET_GROUP_ID,
-        'caption': caption
-    }
+    kind = MEDIA_KINDS[result.file_type]
+    send_params = {'chat_id': config.TARGET_GROUP_ID}
+    if kind.has_caption:
+        send_params['caption'] = format_file_info(result, user, file_type)
     
     # 如果配置了话题ID，添加到发送参数中
     if config.TOPIC_ID and config.TOPIC_ID.strip() and config.TOPIC_ID != '':
@@ -272,34 +275,16 @@ async def forward_to_group(result: dict, user, file_type: str, context) -> None:
         except ValueError:
             logger.warning(f"话题ID格式错误: {config.TOPIC_ID}")
     
-    # 根据文件类型发送到群组
-    if result['file_type'] == 'document':
-        await context.bot.send_document(**send_params, document=result['file_id'])
-    elif result['file_type'] == 'photo':
-        await context.bot.send_photo(**send_params, photo=result['file_id'])
-    elif result['file_type'] == 'video':
-        await context.bot.send_video(**send_params, video=result['file_id'])
-    elif result['file_type'] == 'audio':
-        await context.bot.send_audio(**send_params, audio=result['file_id'])
-    elif result['file_type'] == 'voice':
-        await context.bot.send_voice(**send_params, voice=result['file_id'])
+    # 按媒体类型表中的发送方法发送到群组
+    send_params[kind.file_type] = result.file_id
+    await getattr(context.bot, kind.send_method)(**send_params)
     
     logger.info(f"文件已转发到群组 {config.TARGET_GROUP_ID}")
 
-async def handle_document(update: Update, context) -> None:
-    await handle_file_upload(update, context, "文档")
-
-async def handle_photo(update: Update, context) -> None:
-    await handle_file_upload(update, context, "图片")
-
-async def handle_video(update: Update, context) -> None:
-    await handle_file_upload(update, context, "视频")
-
-async def handle_audio(update: Update, context) -> None:
-    await handle_file_upload(update, context, "音频")
-
-async def handle_voice(update: Update, context) -> None:
-    await handle_file_upload(update, context, "语音")
+async def handle_media(update: Update, context) -> None:
+    """所有媒体类型共用的处理器，显示名称按附件类型查表"""
+    kind, _ = get_attachment(update.message)
+    await handle_file_upload(update, context, kind.label if kind is not None else "文件")
 
 async def handle_text(update: Update, context) -> None:
     """处理文本消息"""
@@ -395,18 +380,15 @@ def main():
         app.add_handler(CommandHandler("status", status_command))
         app.add_handler(CommandHandler("topics", topics_command))
         app.add_handler(CommandHandler("select", select_command))
-        app.add_handler(MessageHandler(filters.Document.ALL, handle_document))
-        app.add_handler(MessageHandler(filters.PHOTO, handle_photo))
-        app.add_handler(MessageHandler(filters.VIDEO, handle_video))
-        app.add_handler(MessageHandler(filters.AUDIO, handle_audio))
-        app.add_handler(MessageHandler(filters.VOICE, handle_voice))
-        app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
+        # 只处理新消息：编辑过的消息和频道消息没有 update.message
+        app.add_handler(MessageHandler(MEDIA_FILTER & filters.UpdateType.MESSAGE, handle_media))
+        app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND & filters.UpdateType.MESSAGE, handle_text))
         
         logger.info("消息处理器设置完成")
         
         # 启动机器人
         logger.info("正在启动 Telegram 文件上传机器人...")
-        app.run_polling(drop_pending_updates=True, allowed_updates=Update.ALL_TYPES)
+        app.run_polling(drop_pending_updates=config.DROP_PENDING_UPDATES, allowed_updates=Update.ALL_TYPES)
         
     except KeyboardInterrupt:
         logger.info("机器人已停止")
@@ -7,13 +7,32 @@
 import os
 import sys
 import time
+import signal
 import asyncio
-from telegram.ext import Application, CommandHandler, MessageHandler, filters
+import secrets
+from functools import lru_cache
+from telegram.ext import Application, CommandHandler, MessageHandler, TypeHandler, filters
 from telegram import Update
-from telegram.error import NetworkError, TimedOut, Conflict, BadRequest
+from telegram.error import NetworkError, TimedOut, Conflict, BadRequest, RetryAfter
 from config import Config
 from file_processor import FileProcessor
-from utils import setup_logging, is_user_allowed, format_file_info
+from media import MEDIA_FILTER, MEDIA_KINDS, FileInfo, get_attachment
+from forward_queue import ForwardQueue, ForwardJob
+from outbox import Outbox
+from dedup_index import DedupIndex
+from album_buffer import AlbumBuffer
+from progress_reporter import ProgressReporter
+from destinations import Destination, parse_destinations
+from routing import RoutingRules
+from topic_registry import TopicRegistry
+from rate_limiter import TelegramRateLimiter
+from update_processor import OrderedUpdateProcessor
+from transport import build_send_request, build_polling_request
+from resilience import CircuitBreaker, CircuitOpenError, RetryScheduler, backoff_delay
+from health import HealthMonitor
+from metrics import BotMetrics
+from tracing import Profiler, Trace, activate, deactivate, span
+from utils import setup_logging, sampled_logger, is_user_allowed, is_user_admin, format_file_info, build_message_link
 from loguru import logger
 
 # 设置环境变量
@@ -25,30 +44,79 @@ os.environ['MAX_FILE_SIZE'] = '2048'
 # 全局变量
 config = Config()
 file_processor = FileProcessor()
-setup_logging()
+forward_queue = ForwardQueue(config.FORWARD_WORKERS, config.FORWARD_QUEUE_SIZE)
+outbox = Outbox(config.OUTBOX_PATH)
+dedup_index = DedupIndex(config.DEDUP_PATH, config.DEDUP_CACHE_SIZE)
+progress = ProgressReporter(config.PROGRESS_INTERVAL)
+extra_destinations = parse_destinations(config.EXTRA_DESTINATIONS)
+routing_rules = RoutingRules(
+    config.ROUTING_CONFIG_PATH,
+    file_processor.supported_types,
+    int(config.TARGET_GROUP_ID),
+    config.ROUTING_RELOAD_INTERVAL
+)
+api_breaker = CircuitBreaker(config.CIRCUIT_FAILURE_THRESHOLD, config.CIRCUIT_RESET_TIMEOUT, config.CIRCUIT_MAX_RESET_TIMEOUT)
+retry_scheduler = RetryScheduler()
+topic_registry = TopicRegistry(config.TOPICS_PATH, config.TOPICS_FLUSH_INTERVAL)
+health = HealthMonitor(max_loop_lag=config.HEALTH_MAX_LOOP_LAG, poll_stale_after=config.HEALTH_POLL_STALE_AFTER)
+metrics = BotMetrics(lambda: forward_queue.depth, lambda: forward_queue.in_flight)
+profiler = Profiler(config.PROFILE_SAMPLE_EVERY)
+http_server = None
+replay_task = None
+album_buffer = AlbumBuffer(config.ALBUM_WINDOW, lambda media_group_id, items: handle_album(media_group_id, items))
+batch_buffer = AlbumBuffer(config.BATCH_WINDOW, lambda chat_key, items: handle_batch(chat_key, items), max_items=100)
+setup_logging(config.LOG_LEVEL, config.LOG_JSON, config.LOG_ASYNC, config.LOG_SAMPLE_EVERY)
 
-# 网络重试配置
-MAX_RETRIES = 5
-RETRY_DELAY = 10  # 秒
+# 群组观察器所在的处理器组（负数组先于默认组 0 执行）
+GROUP_OBSERVER_HANDLER_GROUP = -1
+# 更新计数和分配关联ID所在的处理器组（最先执行，不影响其他处理器）
+BEGIN_UPDATE_HANDLER_GROUP = -2
+
+# 网络重试配置（单次转发内的重试次数，退避时间见 RETRY_BASE_DELAY/RETRY_MAX_DELAY）
+MAX_RETRIES = 3
 CONNECTION_TIMEOUT = 30  # 秒
 
-async def safe_send_message(message, text: str, max_retries: int = 3):
-    """安全发送消息，带重试机制"""
-    for attempt in range(max_retries):
-        try:
+# 关闭时只剩等待中的重试时，检查重试是否已重新入队的间隔（秒）
+DRAIN_POLL_INTERVAL = 0.1
+
+async def safe_send_message(message, text: str, max_retries: int = 3, attempt: int = 0):
+    """安全发送消息：网络错误时按退避时间安排重试，不阻塞更新处理"""
+    if not api_breaker.allow():
+        # 熔断期间不发请求，冷却结束后再试
+        _schedule_message_retry(message, text, max_retries, attempt, api_breaker.retry_in, 'CircuitOpenError')
+        return False
+    
+    try:
+        with span('reply'):
             await message.reply_text(text)
-            return True
-        except (NetworkError, TimedOut) as e:
-            logger.warning(f"发送消息失败 (第 {attempt + 1} 次): {str(e)}")
-            if attempt < max_retries - 1:
-                await asyncio.sleep(5)
-            else:
-                logger.error(f"发送消息最终失败: {str(e)}")
-                return False
-        except Exception as e:
-            logger.error(f"发送消息时发生未知错误: {str(e)}")
-            return False
-    return False
+        api_breaker.record_success()
+        return True
+    except RetryAfter as e:
+        # 限流器已按 retry_after 重试过，这里不再重复等待
+        api_breaker.record_success()
+        logger.error(f"发送消息触发限流，放弃发送: {str(e)}")
+        return False
+    except BadRequest as e:
+        api_breaker.record_success()
+        logger.error(f"发送消息被拒绝: {str(e)}")
+        return False
+    except (NetworkError, TimedOut) as e:
+        api_breaker.record_failure()
+        logger.warning(f"发送消息失败 (第 {attempt + 1} 次): {str(e)}")
+        _schedule_message_retry(message, text, max_retries, attempt, 0.0, type(e).__name__)
+        return False
+    except Exception as e:
+        logger.error(f"发送消息时发生未知错误: {str(e)}")
+        return False
+
+def _schedule_message_retry(message, text: str, max_retries: int, attempt: int, min_delay: float, error_name: str) -> None:
+    """安排消息重发（指数退避 + 抖动），超过重试次数则放弃"""
+    if attempt >= max_retries - 1:
+        logger.error(f"发送消息最终失败，已放弃: {text[:30]}")
+        return
+    metrics.retries.inc('reply', error_name)
+    delay = min_delay + backoff_delay(attempt, config.RETRY_BASE_DELAY, config.RETRY_MAX_DELAY)
+    retry_scheduler.schedule(delay, lambda: safe_send_message(message, text, max_retries, attempt + 1))
 
 async def start_command(update: Update, context) -> None:
     """处理 /start 命令"""
@@ -73,6 +141,8 @@ async def start_command(update: Update, context) -> None:
 • /status - 查看机器人状态
 • /topics - 查看群组话题信息
 • /select ID - 选择话题ID（如：/select 5）
+• /force - 开启/关闭强制重发（管理员）
+• /profile [N|reset] - 查看各阶段耗时 / 记录接下来 N 个更新（管理员）
 
 当前配置：
 • 目标群组：ASMR
@@ -117,20 +187,13 @@ async def topics_command(update: Update, context) -> None:
         topics_text = "群组话题信息\n\n"
         
         # 检查是否有检测到的话题
-        if os.path.exists("detected_topics.json"):
-            import json
-            with open("detected_topics.json", "r", encoding="utf-8") as f:
-                topics_data = json.load(f)
-            
-            if topics_data:
-                topics_text += "检测到的话题：\n"
-                for topic_id, topic_info in topics_data.items():
-                    topic_name = topic_info.get("name", f"话题{topic_id}")
-                    message_count = topic_info.get("count", 0)
-                    topics_text += f"- {topic_name}：{topic_id} (消息数: {message_count})\n"
-            else:
-                topics_text += "暂无检测到的话题\n"
-                topics_text += "\n注意：机器人需要先接收群组消息才能检测话题"
+        if len(topic_registry):
+            topics_text += "检测到的话题：\n"
+            for topic_id, topic_info in topic_registry.items():
+                topic_name = topic_info.get("name", f"话题{topic_id}")
+                message_count = topic_info.get("count", 0)
+                state = "（已删除）" if topic_info.get("deleted") else "（已关闭）" if topic_info.get("closed") else ""
+                topics_text += f"- {topic_name}{state}：{topic_id} (消息数: {message_count})\n"
         else:
             topics_text += "暂无检测到的话题\n"
             topics_text += "\n注意：机器人需要先接收群组消息才能检测话题"
@@ -184,19 +247,32 @@ async def select_command(update: Update, context) -> None:
             )
             return
         
+        # 已关闭/已删除的话题无法发送，直接拒绝
+        topic_info = topic_registry.get(topic_id)
+        if not topic_registry.is_available(topic_id):
+            await safe_send_message(update.message,
+                f"[ERROR] 话题「{topic_info.get('name', topic_id)}」已关闭或已删除，无法选择。\n"
+                f"使用 /topics 查看可用话题。"
+            )
+            return
+        
         # 更新环境变量和配置文件
         os.environ['TOPIC_ID'] = topic_id
         config.TOPIC_ID = topic_id
         
-        # 保存到文件以便持久化
+        # 保存到文件以便持久化（保留路由规则等其他配置）
         try:
             import json
-            config_data = {
+            config_data = {}
+            if os.path.exists(config.ROUTING_CONFIG_PATH):
+                with open(config.ROUTING_CONFIG_PATH, "r", encoding="utf-8") as f:
+                    config_data = json.load(f)
+            config_data.update({
                 "TOPIC_ID": topic_id,
                 "TARGET_GROUP_ID": config.TARGET_GROUP_ID,
                 "MAX_FILE_SIZE": config.MAX_FILE_SIZE
-            }
-            with open("bot_config.json", "w", encoding="utf-8") as f:
+            })
+            with open(config.ROUTING_CONFIG_PATH, "w", encoding="utf-8") as f:
                 json.dump(config_data, f, ensure_ascii=False, indent=2)
         except Exception as e:
             logger.warning(f"保存配置失败: {str(e)}")
@@ -205,17 +281,9 @@ async def select_command(update: Update, context) -> None:
         topic_exists = False
         topic_name = f"话题{topic_id}"
         
-        if os.path.exists("detected_topics.json"):
-            try:
-                import json
-                with open("detected_topics.json", "r", encoding="utf-8") as f:
-                    topics_data = json.load(f)
-                
-                if topic_id in topics_data:
-                    topic_exists = True
-                    topic_name = topics_data[topic_id].get("name", f"话题{topic_id}")
-            except:
-                pass
+        if topic_info is not None:
+            topic_exists = True
+            topic_name = topic_info.get("name", f"话题{topic_id}")
         
         if topic_exists:
             await safe_send_message(update.message,
@@ -241,8 +309,51 @@ async def select_command(update: Update, context) -> None:
         logger.error(f"选择话题时发生错误: {str(e)}")
         await safe_send_message(update.message, "选择话题失败，请稍后重试。")
 
+async def force_command(update: Update, context) -> None:
+    """处理 /force 命令：管理员开启/关闭强制重发（跳过去重）"""
+    user = update.effective_user
+    
+    if not is_user_admin(user.id, config.ADMIN_USERS):
+        await safe_send_message(update.message, "此命令仅限管理员使用。")
+        return
+    
+    force_resend = not context.user_data.get('force_resend', False)
+    context.user_data['force_resend'] = force_resend
+    
+    if force_resend:
+        await safe_send_message(update.message,
+            "已开启强制重发\n"
+            "接下来上传的文件即使已转发过也会再次发送。\n"
+            "再次发送 /force 关闭。"
+        )
+    else:
+        await safe_send_message(update.message, "已关闭强制重发，重复文件将被跳过。")
+    
+    logger.info(f"管理员 {user.id} {'开启' if force_resend else '关闭'}强制重发")
+
+async def profile_command(update: Update, context) -> None:
+    """
+    处理 /profile 命令（管理员）：
+    /profile 查看各阶段耗时汇总，/profile N 采样接下来的 N 个更新，/profile reset 清空汇总
+    """
+    user = update.effective_user
+    
+    if not is_user_admin(user.id, config.ADMIN_USERS):
+        await safe_send_message(update.message, "此命令仅限管理员使用。")
+        return
+    
+    arg = context.args[0].lower() if context.args else ''
+    if arg == 'reset':
+        profiler.reset()
+        await safe_send_message(update.message, "已清空耗时统计。")
+    elif arg.isdigit():
+        profiler.sample_next(int(arg))
+        await safe_send_message(update.message, f"将记录接下来 {int(arg)} 个更新的各阶段耗时，使用 /profile 查看。")
+    else:
+        await safe_send_message(update.message, f"各阶段耗时\n{profiler.report()}")
+
 async def handle_file_upload(update: Update, context, file_type: str) -> None:
-    """处理文件上传"""
+    """处理文件上传：只做校验和入队，转发由后台工作协程完成"""
     user = update.effective_user
     message = update.message
     
@@ -250,95 +361,505 @@ async def handle_file_upload(update: Update, context, file_type: str) -> None:
         await safe_send_message(message, "您没有权限使用此机器人。")
         return
     
-    processing_msg = None
     try:
-        # 发送处理中消息
-        processing_msg = await safe_send_message(message, f"正在处理{file_type}...")
+        # 处理文件（仅提取信息，不涉及网络请求）
+        started = time.perf_counter()
+        with span('process_file'):
+            processed = await file_processor.process_file(message, config)
+        metrics.process_file_seconds.observe(time.perf_counter() - started)
         
-        # 处理文件
-        result = await file_processor.process_file(message, config)
+        if not processed.success:
+            progress.failed(message.chat_id, reason=f"{file_type}：{processed.error}", queued=False)
+            return
+        result = processed.file
+        metrics.file_size_bytes.observe(result.file_size, result.file_type)
         
-        if result['success']:
-            # 转发到目标群组
-            await forward_to_group(result, user, file_type, context)
-            
-            # 更新处理完成消息
-            if processing_msg:
-                await safe_send_message(message,
-                    f"{file_type}处理完成！\n"
-                    f"标题：{result['title']}\n"
-                    f"已转发到目标群组"
-                )
-            
-            logger.info(f"成功处理{file_type}: {result['title']}")
-        else:
-            if processing_msg:
-                await safe_send_message(message, f"处理{file_type}失败：{result['error']}")
+        force = bool(context.user_data.get('force_resend')) and is_user_admin(user.id, config.ADMIN_USERS)
+        
+        # 相册中的文件先缓冲，窗口结束后合并为一次发送
+        if message.media_group_id:
+            album_buffer.add(message.media_group_id, (message, result, force, file_type))
+            return
+        
+        # 批量模式：同一聊天连续上传的文件聚合后批量复制
+        if config.BATCH_COPY_ENABLED:
+            batch_buffer.add(str(message.chat_id), (message, result, force, file_type))
+            return
+        
+        job = ForwardJob(
+            result=result,
+            user=user,
+            file_type=file_type,
+            chat_id=message.chat_id,
+            message_id=message.message_id,
+            force=force
+        )
+        try:
+            position = enqueue_forward_job(job)
+        except asyncio.QueueFull:
+            logger.warning(f"转发队列已满，拒绝{file_type}: {result.title}")
+            progress.failed(message.chat_id, reason="当前转发任务过多，请稍后重试", queued=False)
+            return
+        
+        if position is None:
+            logger.info(f"上传消息已在发件箱中，忽略重复更新: {message.chat_id}/{message.message_id}")
+            return
+        
+        # 状态消息由进度汇报器防抖发送，不阻塞处理器
+        progress.queued(message.chat_id, message.message_id, title=result.title)
+        sampled_logger.info(f"{file_type}已入队: {result.title}（排队: {position}）")
             
     except Exception as e:
         logger.error(f"处理文件上传时发生错误: {str(e)}")
         await safe_send_message(message, "处理文件时发生错误，请稍后重试。")
 
-async def forward_to_group(result: dict, user, file_type: str, context) -> None:
-    """转发文件到目标群组"""
-    caption = format_file_info(result, user, file_type)
+async def handle_album(media_group_id: str, items: list) -> None:
+    """相册聚合窗口结束：整个相册作为一个转发任务入队"""
+    await enqueue_buffered_uploads(items, "相册", batch_copy=False)
+
+async def handle_batch(chat_key: str, items: list) -> None:
+    """批量聚合窗口结束：连续上传的文件按路由目标分组，每组作为一个批量复制任务入队"""
+    groups = {}
+    for item in sorted(items, key=lambda item: item[0].message_id):
+        message, result = item[0], item[1]
+        groups.setdefault(get_primary_destination(result, getattr(message.from_user, 'id', None)).key, []).append(item)
+    for group in groups.values():
+        await enqueue_buffered_uploads(group, "批量文件", batch_copy=True)
+
+async def enqueue_buffered_uploads(items: list, label: str, batch_copy: bool) -> None:
+    """将缓冲的多条上传消息合并为一个转发任务入队"""
+    items.sort(key=lambda item: item[0].message_id)
+    first_message, first_result, _, first_file_type = items[0]
+    results = [result for _, result, _, _ in items]
     
-    send_params = {
-        'chat_id': config.TARGET_GROUP_ID,
-        'caption': caption
-    }
+    if len(items) == 1:
+        # 只有一个文件时按普通上传处理
+        job = ForwardJob(
+            result=first_result,
+            user=first_message.from_user,
+            file_type=first_file_type,
+            chat_id=first_message.chat_id,
+            message_id=first_message.message_id,
+            force=items[0][2]
+        )
+        label = first_file_type
+    else:
+        job = ForwardJob(
+            result=first_result,
+            user=first_message.from_user,
+            file_type=label,
+            chat_id=first_message.chat_id,
+            message_id=first_message.message_id,
+            force=any(force for _, _, force, _ in items),
+            album=results,
+            batch_copy=batch_copy
+        )
     
-    # 如果配置了话题ID，添加到发送参数中
-    if config.TOPIC_ID and config.TOPIC_ID.strip() and config.TOPIC_ID != '':
+    try:
+        position = enqueue_forward_job(job)
+    except asyncio.QueueFull:
+        logger.warning(f"转发队列已满，拒绝{label} ({len(results)} 个文件)")
+        progress.failed(first_message.chat_id, len(results), "当前转发任务过多，请稍后重试", queued=False)
+        return
+    
+    if position is None:
+        logger.info(f"{label}已在发件箱中，忽略重复更新: {first_message.chat_id}/{first_message.message_id}")
+        return
+    
+    progress.queued(first_message.chat_id, first_message.message_id, len(results), first_result.title)
+    sampled_logger.info(f"{label}已入队: {len(results)} 个文件（排队: {position}）")
+
+def enqueue_forward_job(job: ForwardJob):
+    """
+    先写入发件箱再入队，保证重启后可以重放
+    
+    Returns:
+        int: 入队后的队列长度，任务已存在时返回 None
+        
+    Raises:
+        asyncio.QueueFull: 队列已满
+    """
+    if forward_queue.full:
+        raise asyncio.QueueFull()
+    
+    # 目标在入队时确定并写入发件箱，之后的 /select、路由规则修改不影响已入队的任务
+    job.destinations = get_destinations(job)
+    with span('outbox'):
+        job.job_id = outbox.add(job.chat_id, job.message_id, job.to_payload())
+    if job.job_id is None:
+        return None
+    return forward_queue.submit(job)
+
+async def run_forward_job(job: ForwardJob, bot) -> None:
+    """在任务所属更新的追踪上下文中处理转发任务（重放的任务使用发件箱ID作为关联ID）"""
+    if job.trace is None:
+        job.trace = Trace(f"job{job.job_id}")
+    token = activate(job.trace)
+    try:
+        if job.trace.sampled and not job.attempts:
+            job.trace.record('queue_wait', time.monotonic() - job.enqueued_at)
+        await process_forward_job(job, bot)
+    finally:
+        profiler.finish(job.trace)
+        deactivate(token)
+
+async def process_forward_job(job: ForwardJob, bot) -> None:
+    """转发工作协程：并发转发到所有目标，并通过进度汇报器回报结果"""
+    results = job.album or [job.result]
+    label = f"{job.file_type}（{len(results)} 个文件）" if job.album else job.file_type
+    
+    if not job.destinations:
+        # 旧版本写入发件箱的任务没有保存目标，首次处理时确定并保存
+        job.destinations = get_destinations(job)
+        outbox.update(job.job_id, job.to_payload())
+    
+    # 重试和重放的任务只发送到尚未成功、也没有永久失败的目标
+    destinations = [
+        d for d in job.destinations if d.key not in job.done_destinations and d.key not in job.failed_destinations
+    ]
+    outcomes = await asyncio.gather(
+        *(forward_job_to_destination(job, results, destination, bot) for destination in destinations),
+        return_exceptions=True
+    )
+    
+    duplicate_maps = []
+    retry_error = None
+    attempted = False  # 是否有目标真正发出请求后失败（熔断拒绝不计入重试次数）
+    for destination, outcome in zip(destinations, outcomes):
+        if not isinstance(outcome, Exception):
+            job.done_destinations.append(destination.key)
+            duplicate_maps.append(outcome)
+            count_forwards(results, destination, 'forwarded', outcome)
+            continue
+        
+        if isinstance(outcome, (NetworkError, TimedOut, RetryAfter)) and not isinstance(outcome, BadRequest):
+            # 临时性错误：该目标保留为未完成，稍后重试
+            retry_error = outcome
+            attempted = attempted or not isinstance(outcome, CircuitOpenError)
+            count_forwards(results, destination, 'retry')
+            logger.error(f"转发{label}到 {destination.display_name} 失败，稍后重试: {str(outcome)}")
+        else:
+            # BadRequest 继承自 NetworkError，但重试无意义；单独记录，任务结束时按失败回报
+            job.failed_destinations[destination.key] = f"{destination.display_name}: {str(outcome)}"
+            count_forwards(results, destination, 'failed')
+            if (isinstance(outcome, BadRequest) and is_registered_topic(destination)
+                    and "thread not found" in str(outcome).lower()):
+                # 服务器提示话题不存在，记入目录，后续发送直接拒绝
+                topic_registry.update(destination.topic_id, deleted=True)
+            logger.error(f"转发{label}到 {destination.display_name} 失败: {str(outcome)}")
+    
+    if retry_error is not None:
+        metrics.retries.inc('job', type(retry_error).__name__)
+        # 按退避时间重新入队（熔断期间等到冷却结束），只重试未完成的目标，进度仍显示排队中；
+        # 仅被熔断拒绝时不增加重试次数，次数用完后每 RETRY_MAX_DELAY 秒重试一次，不会搁置在发件箱中
+        if not attempted:
+            # 冷却结束后尽快重试，抖动避免积压的任务同时发出
+            backoff = backoff_delay(0, config.RETRY_BASE_DELAY, config.RETRY_MAX_DELAY)
+        elif job.attempts < config.FORWARD_MAX_ATTEMPTS:
+            backoff = backoff_delay(job.attempts, config.RETRY_BASE_DELAY, config.RETRY_MAX_DELAY)
+            job.attempts += 1
+        else:
+            if job.attempts == config.FORWARD_MAX_ATTEMPTS:
+                progress.retrying(job.chat_id, f"网络持续异常，每 {config.RETRY_MAX_DELAY:.0f} 秒重试一次")
+            backoff = config.RETRY_MAX_DELAY
+            job.attempts += 1
+        delay = api_breaker.retry_in + backoff
+        outbox.update(job.job_id, job.to_payload())
+        retry_scheduler.schedule(delay, lambda: forward_queue.put(job))
+        logger.warning(f"{label}将在 {delay:.1f} 秒后重试（第 {job.attempts} 次）")
+        return
+    
+    if job.failed_destinations:
+        # 有目标永久失败（包括之前运行中失败的目标）：整个任务记为失败，其余目标已发送
+        failures = list(job.failed_destinations.values())
+        outbox.mark_failed(job.job_id, "; ".join(failures))
+        reason = failures[0]
+        if len(job.destinations) > 1:
+            reason = f"{len(failures)}/{len(job.destinations)} 个目标失败，{reason}"
+        progress.failed(job.chat_id, len(results), reason)
+        return
+    
+    with span('outbox'):
+        outbox.mark_done(job.job_id)
+    
+    # 在所有目标中都已存在的文件计为跳过
+    skipped = set.intersection(*(set(m) for m in duplicate_maps)) if duplicate_maps else set()
+    if skipped:
+        first_skipped = min(skipped)
+        original_message_id = duplicate_maps[0][first_skipped]
+        link = build_message_link(destinations[0].chat_id, original_message_id)
+        progress.skipped(job.chat_id, len(skipped), f"已转发过：{link or original_message_id}")
+    
+    forwarded = [result for index, result in enumerate(results) if index not in skipped]
+    if forwarded:
+        progress.forwarded(job.chat_id, len(forwarded), forwarded[-1].title)
+    sampled_logger.info(f"成功处理{label}: {job.result.title}（{len(destinations)} 个目标）")
+
+def count_forwards(results: list, destination: Destination, outcome: str, skipped: dict = None) -> None:
+    """按文件记录转发结果（因重复跳过的文件记为 skipped）"""
+    for index, result in enumerate(results):
+        metrics.forwards.inc(
+            result.file_type, destination.display_name, 'skipped' if skipped and index in skipped else outcome
+        )
+
+async def forward_job_to_destination(job: ForwardJob, results: list, destination: Destination, bot) -> dict:
+    """
+    将任务中的文件转发到单个目标
+    
+    Returns:
+        dict: 因重复而跳过的文件 {results 下标: 原消息ID}
+    """
+    # 已关闭/已删除的话题直接拒绝，不发起注定失败的请求
+    if is_registered_topic(destination) and not topic_registry.is_available(destination.topic_id):
+        raise BadRequest(f"话题 {destination.topic_id} 已关闭或已删除")
+    
+    # 同一文件已转发到同一群组/话题时跳过，管理员可强制重发
+    to_send = list(range(len(results)))
+    duplicates = {}
+    reserved = []  # 本次预占的文件，只释放这些（强制重发和未开启去重时不预占）
+    if config.DEDUP_ENABLED and not job.force:
+        with span('dedup'):
+            to_send, duplicates = await dedup_index.reserve_unsent(
+                destination.chat_id, destination.topic_id, [result.file_unique_id for result in results]
+            )
+        reserved = [results[index] for index in to_send]
+        for index in duplicates:
+            sampled_logger.info(f"跳过重复文件: {results[index].title} -> {destination.display_name}")
+    
+    if not to_send:
+        return duplicates
+    
+    items = [results[index] for index in to_send]
+    try:
+        if job.batch_copy:
+            sent_messages = await forward_batch_to_group(items, job.user, job.chat_id, bot, destination)
+        elif job.album:
+            sent_messages = await forward_album_to_group(items, job.user, bot, destination)
+        else:
+            sent_messages = [await forward_to_group(items[0], job.user, job.file_type, bot, destination)]
+        
+        if config.DEDUP_ENABLED:
+            for result, sent_message in zip(items, sent_messages):
+                dedup_index.record(destination.chat_id, destination.topic_id, result.file_unique_id, sent_message.message_id)
+    finally:
+        # 发送失败时释放预占，等待中的任务会重新查询并自行发送
+        for result in reserved:
+            dedup_index.release(destination.chat_id, destination.topic_id, result.file_unique_id)
+    
+    return duplicates
+
+def get_target_topic_id():
+    """获取当前配置的话题ID，未配置或格式错误时返回 None"""
+    return _parse_topic_id(config.TOPIC_ID)
+
+@lru_cache(maxsize=8)
+def _parse_topic_id(topic_id: str):
+    """解析话题ID（结果按字符串缓存，/select 修改后自动重新解析）"""
+    if topic_id and topic_id.strip():
         try:
-            topic_id = int(config.TOPIC_ID.strip())
-            send_params['message_thread_id'] = topic_id
-            logger.info(f"使用话题模式，话题ID: {topic_id}")
+            return int(topic_id.strip())
         except ValueError:
-            logger.warning(f"话题ID格式错误: {config.TOPIC_ID}")
+            logger.warning(f"话题ID格式错误: {topic_id}")
+    return None
+
+def is_registered_topic(destination: Destination) -> bool:
+    """目标是否为话题注册表所记录的群组（主群组）中的话题"""
+    return destination.topic_id is not None and destination.chat_id == int(config.TARGET_GROUP_ID)
+
+def get_destinations(job: ForwardJob) -> list:
+    """
+    确定任务的所有转发目标（入队时调用一次）：路由规则选中的目标 + 额外目标
+    
+    相册按第一个文件路由；批量文件在 handle_batch 中已按路由目标分组，组内文件目标相同
+    """
+    return [get_primary_destination(job.result, job.user_id)] + extra_destinations
+
+def get_primary_destination(result: FileInfo, user_id) -> Destination:
+    """路由规则为文件选中的目标，没有匹配时为主群组当前话题"""
+    primary = routing_rules.route(result, user_id)
+    if primary is None:
+        primary = Destination(int(config.TARGET_GROUP_ID), get_target_topic_id(), "主群组")
+    return primary
+
+def get_send_params(destination: Destination) -> dict:
+    """构建发送到目标群组的公共参数"""
+    send_params = {'chat_id': destination.chat_id}
     
-    # 根据文件类型发送到群组，带重试机制
+    # 如果配置了话题ID，添加到发送参数中
+    if destination.topic_id is not None:
+        send_params['message_thread_id'] = destination.topic_id
+        sampled_logger.info(f"使用话题模式，话题ID: {destination.topic_id}")
+    
+    return send_params
+
+async def forward_to_group(result: FileInfo, user, file_type: str, bot, destination: Destination):
+    """转发文件到目标群组，返回发送后的消息"""
+    kind = MEDIA_KINDS[result.file_type]
+    send_params = get_send_params(destination)
+    if kind.has_caption:
+        send_params['caption'] = format_file_info(result, user, file_type)
+    send_params[kind.file_type] = result.file_id
+    
+    # 按媒体类型表中的发送方法发送到群组，带重试机制
+    send_file = getattr(bot, kind.send_method)
+    sent_message = await _forward_with_retry(lambda: send_file(**send_params), 'send')
+    sampled_logger.info(f"文件已转发到 {destination.display_name}")
+    return sent_message
+
+# send_media_group 单次最多 10 个文件
+MEDIA_GROUP_LIMIT = 10
+
+async def forward_album_to_group(results: list, user, bot, destination: Destination) -> list:
+    """以相册形式转发多个文件，返回与 results 一一对应的消息列表"""
+    sent_messages = []
+    for start in range(0, len(results), MEDIA_GROUP_LIMIT):
+        chunk = results[start:start + MEDIA_GROUP_LIMIT]
+        
+        # 相册至少需要 2 个文件，单个或不能放入相册的类型（语音、动图等）逐个发送
+        if len(chunk) < 2 or any(MEDIA_KINDS[r.file_type].input_media is None for r in chunk):
+            for result in chunk:
+                sent_messages.append(await forward_to_group(result, user, result.file_type, bot, destination))
+            continue
+        
+        media = [
+            MEDIA_KINDS[r.file_type].input_media(media=r.file_id, caption=format_file_info(r, user, r.file_type))
+            for r in chunk
+        ]
+        send_params = get_send_params(destination)
+        messages = await _forward_with_retry(lambda: bot.send_media_group(**send_params, media=media), 'media_group')
+        sent_messages.extend(messages)
+    
+    sampled_logger.info(f"相册已转发到 {destination.display_name}，共 {len(results)} 个文件")
+    return sent_messages
+
+# copyMessages 单次最多 100 条消息
+COPY_MESSAGES_LIMIT = 100
+
+def needs_caption_rewrite(result: FileInfo) -> bool:
+    """判断文件是否需要补写标题（原消息没有说明，不会显示文件名，且该类型支持说明）"""
+    kind = MEDIA_KINDS[result.file_type]
+    return not result.original_caption and kind.has_caption and not kind.shows_file_name
+
+async def forward_batch_to_group(results: list, user, from_chat_id: int, bot, destination: Destination) -> list:
+    """
+    批量复制文件到目标群组，返回与 results 一一对应的消息列表
+    
+    保留原始说明的文件使用 copyMessages 批量复制，需要补写标题的文件逐个发送，整体顺序保持不变
+    """
+    sent_messages = []
+    run = []
+    
+    async def flush_run():
+        for start in range(0, len(run), COPY_MESSAGES_LIMIT):
+            sent_messages.extend(await copy_messages_to_group(
+                run[start:start + COPY_MESSAGES_LIMIT], user, from_chat_id, bot, destination
+            ))
+        run.clear()
+    
+    for result in results:
+        if needs_caption_rewrite(result):
+            await flush_run()
+            sent_messages.append(await forward_to_group(result, user, result.file_type, bot, destination))
+        else:
+            run.append(result)
+    await flush_run()
+    
+    sampled_logger.info(f"批量文件已转发到 {destination.display_name}，共 {len(results)} 个文件")
+    return sent_messages
+
+async def copy_messages_to_group(results: list, user, from_chat_id: int, bot, destination: Destination) -> list:
+    """使用 copyMessages 复制一批文件，接口拒绝时改为逐个发送"""
+    if len(results) == 1:
+        return [await forward_to_group(results[0], user, results[0].file_type, bot, destination)]
+    
+    send_params = get_send_params(destination)
+    try:
+        message_ids = await _forward_with_retry(lambda: bot.copy_messages(
+            chat_id=send_params['chat_id'],
+            from_chat_id=from_chat_id,
+            message_ids=[result.message_id for result in results],
+            message_thread_id=send_params.get('message_thread_id')
+        ), 'copy_messages')
+    except BadRequest as e:
+        logger.warning(f"批量复制被拒绝，改为逐个发送: {str(e)}")
+        return [await forward_to_group(result, user, result.file_type, bot, destination) for result in results]
+    
+    if len(message_ids) != len(results):
+        # 部分消息无法复制时无法知道缺少的是哪些文件：删除已复制的消息，改为逐个发送
+        logger.warning(f"批量复制 {len(results)} 个文件，实际复制 {len(message_ids)} 个，改为逐个发送")
+        await delete_copied_messages(bot, send_params['chat_id'], message_ids)
+        return [await forward_to_group(result, user, result.file_type, bot, destination) for result in results]
+    return list(message_ids)
+
+async def delete_copied_messages(bot, chat_id: int, message_ids: list) -> None:
+    """删除不完整的批量复制结果，删除失败时只记录（这些文件会在目标中出现两次）"""
+    if not message_ids:
+        return
+    try:
+        await bot.delete_messages(chat_id=chat_id, message_ids=[message_id.message_id for message_id in message_ids])
+    except (NetworkError, RetryAfter) as e:
+        logger.warning(f"删除不完整的批量复制结果失败，{len(message_ids)} 个文件将重复出现: {str(e)}")
+
+async def _forward_with_retry(send, method: str):
+    """执行转发操作，网络错误时按指数退避重试；熔断期间直接失败，由任务级重试稍后处理"""
+    started = time.perf_counter()
+    try:
+        return await _send_with_retry(send, method)
+    finally:
+        metrics.forward_seconds.observe(time.perf_counter() - started, method)
+
+async def _send_with_retry(send, method: str):
+    """单次转发的重试循环"""
     for attempt in range(MAX_RETRIES):
+        if not api_breaker.allow():
+            raise CircuitOpenError(f"Bot API 熔断中，{api_breaker.retry_in:.0f} 秒后重试")
+        
+        metrics.sends_in_flight.inc()
         try:
-            if result['file_type'] == 'document':
-                await context.bot.send_document(**send_params, document=result['file_id'])
-            elif result['file_type'] == 'photo':
-                await context.bot.send_photo(**send_params, photo=result['file_id'])
-            elif result['file_type'] == 'video':
-                await context.bot.send_video(**send_params, video=result['file_id'])
-            elif result['file_type'] == 'audio':
-                await context.bot.send_audio(**send_params, audio=result['file_id'])
-            elif result['file_type'] == 'voice':
-                await context.bot.send_voice(**send_params, voice=result['file_id'])
-            
-            logger.info(f"文件已转发到群组 {config.TARGET_GROUP_ID}")
-            return
+            with span('forward'):
+                result = await send()
+            api_breaker.record_success()
+            health.record_send()
+            return result
             
+        except (RetryAfter, BadRequest):
+            # 服务器有响应，网络正常；限流器已按 retry_after 重试过；请求错误重试无意义，直接上报
+            api_breaker.record_success()
+            raise
         except (NetworkError, TimedOut) as e:
+            api_breaker.record_failure()
             logger.warning(f"转发文件失败 (第 {attempt + 1} 次): {str(e)}")
-            if attempt < MAX_RETRIES - 1:
-                await asyncio.sleep(RETRY_DELAY)
-            else:
+            if attempt >= MAX_RETRIES - 1:
                 logger.error(f"转发文件最终失败: {str(e)}")
                 raise
+            metrics.retries.inc(method, type(e).__name__)
+        finally:
+            metrics.sends_in_flight.dec()
+        with span('retry_sleep'):
+            await asyncio.sleep(backoff_delay(attempt, config.RETRY_BASE_DELAY, config.RETRY_MAX_DELAY))
 
-async def handle_document(update: Update, context) -> None:
-    await handle_file_upload(update, context, "文档")
-
-async def handle_photo(update: Update, context) -> None:
-    await handle_file_upload(update, context, "图片")
+# 更新类型即 Update 上对应的字段名
+UPDATE_TYPES = tuple(str(update_type) for update_type in Update.ALL_TYPES)
 
-async def handle_video(update: Update, context) -> None:
-    await handle_file_upload(update, context, "视频")
+def get_update_type(update: Update) -> str:
+    """更新的类型（message、edited_message、callback_query 等）"""
+    for update_type in UPDATE_TYPES:
+        if getattr(update, update_type, None) is not None:
+            return update_type
+    return 'unknown'
 
-async def handle_audio(update: Update, context) -> None:
-    await handle_file_upload(update, context, "音频")
+async def begin_update(update: Update, context) -> None:
+    """按类型统计收到的更新，并以 update_id 作为关联ID（按采样规则记录各阶段耗时）"""
+    metrics.updates.inc(get_update_type(update))
+    profiler.begin(str(update.update_id))
 
-async def handle_voice(update: Update, context) -> None:
-    await handle_file_upload(update, context, "语音")
+async def handle_media(update: Update, context) -> None:
+    """所有媒体类型共用的处理器，显示名称按附件类型查表"""
+    kind, _ = get_attachment(update.message)
+    await handle_file_upload(update, context, kind.label if kind is not None else "文件")
 
 async def handle_text(update: Update, context) -> None:
-    """处理文本消息"""
+    """处理私聊文本消息"""
     user = update.effective_user
     message = update.message
     
@@ -346,88 +867,301 @@ async def handle_text(update: Update, context) -> None:
         await safe_send_message(message, "您没有权限使用此机器人。")
         return
     
-    # 检测话题信息
-    try:
-        if message.chat.id == int(config.TARGET_GROUP_ID) and message.message_thread_id:
-            # 这是群组消息且有话题ID，记录话题信息
-            topic_id = str(message.message_thread_id)
-            
-            # 尝试获取更好的话题名称
-            topic_name = f"话题{topic_id}"
-            if message.text and len(message.text.strip()) > 0:
-                # 使用消息内容作为话题名称，但限制长度
-                clean_text = message.text.strip()
-                if len(clean_text) > 30:
-                    topic_name = clean_text[:30] + "..."
-                else:
-                    topic_name = clean_text
-            elif message.caption and len(message.caption.strip()) > 0:
-                # 如果有图片说明，使用说明作为话题名称
-                clean_caption = message.caption.strip()
-                if len(clean_caption) > 30:
-                    topic_name = clean_caption[:30] + "..."
-                else:
-                    topic_name = clean_caption
-            
-            # 读取现有话题数据
-            topics_data = {}
-            if os.path.exists("detected_topics.json"):
-                import json
-                try:
-                    with open("detected_topics.json", "r", encoding="utf-8") as f:
-                        topics_data = json.load(f)
-                except:
-                    topics_data = {}
-            
-            # 更新话题信息
-            if topic_id not in topics_data:
-                topics_data[topic_id] = {
-                    "name": topic_name,
-                    "count": 1,
-                    "last_detected": message.date.isoformat()
-                }
-            else:
-                topics_data[topic_id]["count"] += 1
-                topics_data[topic_id]["last_detected"] = message.date.isoformat()
-                # 更新话题名称（使用最新的消息内容）
-                if message.text and len(message.text) > 0:
-                    topics_data[topic_id]["name"] = topic_name
-            
-            # 保存话题数据
-            import json
-            with open("detected_topics.json", "w", encoding="utf-8") as f:
-                json.dump(topics_data, f, ensure_ascii=False, indent=2)
-            
-            logger.info(f"检测到话题: {topic_name} (ID: {topic_id})")
-    except Exception as e:
-        logger.error(f"话题检测失败: {str(e)}")
-    
     # 回复用户
     await safe_send_message(message,
         "请发送文件给我，我会帮您转发到指定群组。\n"
         "使用 /status 查看机器人状态，/topics 查看话题信息，/select ID 选择话题。"
     )
 
+async def observe_group_message(update: Update, context) -> None:
+    """
+    观察目标群组中的话题消息：只更新内存中的话题统计，不回复、不做权限检查
+    
+    注册在独立的处理器组中，不影响其他处理器，也不占用发送配额
+    """
+    message = update.effective_message
+    topic_id = message.message_thread_id
+    topic = topic_registry.observe(topic_id, message.date.isoformat())
+    
+    # 话题内的消息默认回复话题的创建消息，可以借此补全启动前创建的话题名称；
+    # 已从服务消息获知名称（包括编辑后的名称）时不补全，避免被创建时的名称覆盖
+    reply = message.reply_to_message
+    if not topic_registry.name_known(topic_id) and reply is not None and reply.forum_topic_created:
+        created = reply.forum_topic_created
+        topic_registry.update(
+            topic_id,
+            name=created.name,
+            icon_color=created.icon_color,
+            icon_custom_emoji_id=created.icon_custom_emoji_id,
+            name_source='reply'
+        )
+    
+    if topic["count"] == 1:
+        logger.info(f"检测到话题: {topic['name']} (ID: {topic_id})")
+
+async def handle_forum_topic_update(update: Update, context) -> None:
+    """处理目标群组的论坛服务消息（话题创建/编辑/关闭/重新打开），维护话题目录"""
+    message = update.effective_message
+    topic_id = message.message_thread_id
+    
+    if message.forum_topic_created:
+        created = message.forum_topic_created
+        topic = topic_registry.update(
+            topic_id,
+            name=created.name,
+            icon_color=created.icon_color,
+            icon_custom_emoji_id=created.icon_custom_emoji_id,
+            name_source='created',
+            closed=False,
+            deleted=False
+        )
+        logger.info(f"话题已创建: {topic['name']} (ID: {topic_id})")
+    elif message.forum_topic_edited:
+        edited = message.forum_topic_edited
+        # name 为空表示名称未修改，icon_custom_emoji_id 为空字符串表示移除图标
+        topic = topic_registry.update(
+            topic_id,
+            name=edited.name,
+            icon_custom_emoji_id=edited.icon_custom_emoji_id,
+            name_source='edited' if edited.name else None
+        )
+        logger.info(f"话题已编辑: {topic['name']} (ID: {topic_id})")
+    elif message.forum_topic_closed:
+        topic = topic_registry.update(topic_id, closed=True)
+        logger.info(f"话题已关闭: {topic['name']} (ID: {topic_id})")
+    elif message.forum_topic_reopened:
+        topic = topic_registry.update(topic_id, closed=False)
+        logger.info(f"话题已重新打开: {topic['name']} (ID: {topic_id})")
+
+async def post_init(application: Application) -> None:
+    """应用初始化后启动转发工作协程，并在后台重放发件箱中未完成的任务"""
+    outbox.open()
+    if config.DEDUP_ENABLED:
+        dedup_index.open()
+    purged = outbox.purge(config.OUTBOX_RETENTION_DAYS)
+    if purged:
+        logger.info(f"已清理 {purged} 条过期的转发记录")
+    
+    topic_registry.load()
+    await topic_registry.start()
+    await health.start()
+    if config.BOT_MODE != 'webhook' and (config.HEALTH_ENABLED or config.METRICS_ENABLED):
+        # 长轮询模式下只提供健康检查和指标接口（webhook 模式由 run_webhook 启动服务器）
+        await start_http_server(application)
+    progress.attach(application.bot)
+    await forward_queue.start(lambda job: run_forward_job(job, application.bot))
+    
+    # 积压超过队列长度时入队会等待工作协程腾出空间，在后台重放，不推迟长轮询启动
+    global replay_task
+    replay_task = asyncio.create_task(replay_outbox(), name="outbox-replay")
+
+async def replay_outbox() -> None:
+    """
+    重放发件箱中未完成的任务（队列满时等待；关闭时取消，未入队的任务下次启动时重放）
+    
+    无法恢复的任务（内容损坏或与当前版本不兼容）标记为失败，不影响其他任务的重放
+    """
+    pending = outbox.pending()
+    if pending:
+        logger.info(f"开始重放 {len(pending)} 个未完成的转发任务")
+    replayed = 0
+    for job_id, payload in pending:
+        try:
+            job = ForwardJob.from_payload(payload, job_id)
+            progress.queued(job.chat_id, job.message_id, len(job.album) or 1, job.result.title)
+        except Exception as e:
+            logger.error(f"转发任务 {job_id} 无法恢复，已标记为失败: {e!r}")
+            outbox.mark_failed(job_id, f"无法恢复: {e!r}")
+            continue
+        await forward_queue.put(job)
+        replayed += 1
+    if pending:
+        logger.info(f"已重放 {replayed}/{len(pending)} 个未完成的转发任务")
+
+async def stop_replay() -> None:
+    """停止尚未完成的发件箱重放"""
+    if replay_task is not None and not replay_task.done():
+        replay_task.cancel()
+        await asyncio.gather(replay_task, return_exceptions=True)
+        logger.info("发件箱重放已停止，未入队的任务下次启动时重放")
+
+async def post_stop(application: Application) -> None:
+    """
+    应用停止后（已不再接收更新）的优雅关闭：
+    缓冲中的相册和批量文件写入发件箱，在宽限期内等待转发队列处理完毕，然后发布最终进度。
+    宽限期内未完成的任务保留在发件箱中，下次启动时重放
+    """
+    await stop_replay()
+    await album_buffer.flush_all()
+    await batch_buffer.flush_all()
+    
+    pending = pending_forwards()
+    if pending:
+        logger.info(f"等待 {pending} 个转发任务和重试完成（最多 {config.SHUTDOWN_GRACE_PERIOD} 秒）...")
+        if await drain_forwards(config.SHUTDOWN_GRACE_PERIOD):
+            logger.info("转发任务已全部完成")
+        else:
+            logger.warning(f"宽限期已到，{pending_forwards()} 个转发任务和重试保留在发件箱中，下次启动时重放")
+    
+    await progress.flush_all()
+
+def pending_forwards() -> int:
+    """排队中、处理中和等待重试（按退避时间稍后重新入队）的任务数"""
+    return forward_queue.depth + forward_queue.in_flight + retry_scheduler.pending
+
+async def drain_forwards(timeout: float) -> bool:
+    """
+    在宽限期内等待转发队列和等待中的重试全部完成（重试到期后重新入队，继续等待）
+    
+    Returns:
+        bool: 是否在超时前全部完成
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while pending_forwards():
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return False
+        if forward_queue.depth or forward_queue.in_flight:
+            await forward_queue.drain(remaining)
+        else:
+            # 只剩等待中的重试：定时器到期后任务重新入队
+            await asyncio.sleep(min(DRAIN_POLL_INTERVAL, remaining))
+    return True
+
+async def post_shutdown(application: Application) -> None:
+    """应用关闭时停止转发工作协程并关闭发件箱（等待中的重试取消，未完成的任务下次启动时重放）"""
+    await stop_replay()
+    await retry_scheduler.cancel_all()
+    await forward_queue.stop()
+    await topic_registry.stop()
+    await health.stop()
+    if http_server is not None:
+        await http_server.stop()
+    outbox.close()
+    dedup_index.close()
+    # 等待后台线程写完队列中的日志
+    await logger.complete()
+
 async def error_handler(update: Update, context) -> None:
-    """错误处理器"""
+    """错误处理器：只做分类记录，不在更新处理中等待（重试由 retry_scheduler 和熔断器负责）"""
     error = context.error
     logger.error(f"更新处理时发生错误: {error}")
     
     if isinstance(error, Conflict):
+        # 另一个实例正在轮询，PTB 会自行退避重试
         logger.warning(f"机器人实例冲突: {error}")
-        # 等待一段时间后重试
-        await asyncio.sleep(10)
-    elif isinstance(error, (NetworkError, TimedOut)):
-        logger.warning(f"网络错误: {error}")
-        # 等待一段时间后重试
-        await asyncio.sleep(5)
     elif isinstance(error, BadRequest):
+        # BadRequest 继承自 NetworkError，需要先判断
         logger.warning(f"请求错误: {error}")
+    elif isinstance(error, (NetworkError, TimedOut)):
+        api_breaker.record_failure()
+        logger.warning(f"网络错误（熔断器: {api_breaker.state}）: {error}")
     else:
         logger.error(f"未知错误: {error}")
 
+def get_send_pool_size() -> int:
+    """发送连接池大小：未配置时按并发估算（每个转发工作协程同时发往所有目标 + 并发处理的更新 + 进度消息）"""
+    if config.SEND_POOL_SIZE > 0:
+        return config.SEND_POOL_SIZE
+    return config.FORWARD_WORKERS * (1 + len(extra_destinations)) + max(1, config.CONCURRENT_UPDATES) + 4
+
+def get_readiness(application: Application) -> dict:
+    """/readyz：应用在运行、启动时 getMe 成功、轮询未中断、转发队列未满且 Bot API 未熔断"""
+    try:
+        # Application.initialize 时已调用 getMe 并缓存，这里不再请求 Bot API
+        bot_username = application.bot.username
+    except RuntimeError:
+        bot_username = None
+    return health.readiness(
+        running=application.running,
+        polling=config.BOT_MODE != 'webhook',
+        bot_username=bot_username,
+        queue_depth=forward_queue.depth,
+        in_flight=forward_queue.in_flight,
+        queue_full=forward_queue.full,
+        circuit=api_breaker.state
+    )
+
+async def start_http_server(application: Application, webhook_path=None, secret_token=None):
+    """启动内嵌 HTTP 服务器（健康检查和指标，webhook 模式下同时接收更新）"""
+    global http_server
+    try:
+        # aiohttp 只在启动 HTTP 服务器时需要
+        from webhook_server import WebhookServer
+    except ImportError:
+        if webhook_path:
+            raise
+        logger.warning("未安装 aiohttp，健康检查和指标接口未启动")
+        return None
+    
+    probes = {}
+    if config.HEALTH_ENABLED:
+        probes = {
+            "/healthz": health.liveness,
+            "/readyz": lambda: get_readiness(application)
+        }
+    http_server = WebhookServer(
+        application,
+        host=config.get_listen_host(),
+        port=config.WEBHOOK_PORT,
+        webhook_path=webhook_path,
+        secret_token=secret_token,
+        probes=probes,
+        metrics=metrics.render if config.METRICS_ENABLED else None,
+        on_update=health.record_poll
+    )
+    await http_server.start()
+    return http_server
+
+async def run_webhook(application: Application) -> None:
+    """webhook 模式：内嵌 HTTP 服务器接收 Telegram 推送的更新，生命周期钩子与 run_polling 一致"""
+    # 未配置 secret token 时每次启动随机生成（启动时会重新设置 webhook）
+    secret_token = config.WEBHOOK_SECRET_TOKEN or secrets.token_urlsafe(32)
+    server = None
+    
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            # Windows 不支持，依赖 KeyboardInterrupt
+            pass
+    
+    await application.initialize()
+    await post_init(application)
+    try:
+        await application.start()
+        server = await start_http_server(application, config.WEBHOOK_PATH, secret_token)
+        webhook_url = config.WEBHOOK_URL.rstrip('/') + config.WEBHOOK_PATH
+        await application.bot.set_webhook(
+            url=webhook_url,
+            secret_token=secret_token,
+            allowed_updates=Update.ALL_TYPES,
+            drop_pending_updates=config.DROP_PENDING_UPDATES,
+            max_connections=config.WEBHOOK_MAX_CONNECTIONS
+        )
+        logger.info(f"webhook 已设置: {webhook_url}")
+        await stop_event.wait()
+    finally:
+        if server is not None:
+            # 先停止接收推送，再处理剩余的更新
+            await server.stop()
+        if application.running:
+            await application.stop()
+            await post_stop(application)
+        await application.shutdown()
+        await post_shutdown(application)
+
 def main():
     """主函数"""
+    try:
+        config.validate()
+    except ValueError as e:
+        print(f"配置错误: {str(e)}")
+        sys.exit(1)
+    
     print("Telegram 文件上传机器人 (超稳定版)")
     print("=" * 50)
     print(f"群组: ASMR")
@@ -436,7 +1170,11 @@ def main():
     print(f"话题模式: 已启用")
     print(f"最大文件大小: {config.MAX_FILE_SIZE}MB")
     print(f"网络重试: {MAX_RETRIES}次")
+    print(f"转发工作协程: {config.FORWARD_WORKERS}个")
+    print(f"并发处理更新: {config.CONCURRENT_UPDATES}个")
     print(f"连接超时: {CONNECTION_TIMEOUT}秒")
+    print(f"接收更新: {'webhook' if config.BOT_MODE == 'webhook' else '长轮询'}")
+    print(f"Bot API: {config.BOT_API_BASE_URL or '官方云端'}{'（本地模式）' if config.BOT_API_LOCAL_MODE else ''}")
     print("=" * 50)
     print("正在启动机器人...")
     print("按 Ctrl+C 停止机器人")
@@ -444,19 +1182,78 @@ def main():
     
     try:
         # 创建应用程序
-        app = Application.builder().token(config.BOT_TOKEN).build()
+        builder = (
+            Application.builder()
+            .token(config.BOT_TOKEN)
+            .rate_limiter(TelegramRateLimiter(
+                global_per_second=config.RATE_LIMIT_GLOBAL_PER_SECOND,
+                group_per_minute=config.RATE_LIMIT_GROUP_PER_MINUTE,
+                private_per_second=config.RATE_LIMIT_PRIVATE_PER_SECOND,
+                topic_per_minute=config.RATE_LIMIT_TOPIC_PER_MINUTE,
+                max_retries=config.RATE_LIMIT_MAX_RETRIES
+            ))
+            .post_init(post_init)
+            .post_stop(post_stop)
+            .post_shutdown(post_shutdown)
+            .request(build_send_request(config, get_send_pool_size()))
+        )
+        if config.BOT_API_BASE_URL:
+            # 自建 Bot API 服务器：不受云端 20MB 下载/50MB 上传限制；
+            # local_mode 下 getFile 返回服务器上的本地路径，File.download_* 直接读取磁盘，不经过 HTTP
+            builder = (
+                builder
+                .base_url(config.BOT_API_BASE_URL)
+                .base_file_url(config.get_base_file_url())
+                .local_mode(config.BOT_API_LOCAL_MODE)
+            )
+        if config.BOT_MODE != 'webhook':
+            # 长轮询使用独立的连接池，媒体发送不会排在 getUpdates 之后
+            builder = builder.get_updates_request(build_polling_request(config, on_success=health.record_poll))
+        if config.CONCURRENT_UPDATES > 1:
+            # 不同聊天的更新并发处理，同一聊天内保持顺序
+            builder = builder.concurrent_updates(OrderedUpdateProcessor(config.CONCURRENT_UPDATES))
+        if config.BOT_MODE == 'webhook':
+            # webhook 模式由内嵌服务器接收更新，不需要长轮询的 Updater
+            builder = builder.updater(None)
+        app = builder.build()
         
         # 设置处理器
         app.add_handler(CommandHandler("start", start_command))
         app.add_handler(CommandHandler("status", status_command))
         app.add_handler(CommandHandler("topics", topics_command))
         app.add_handler(CommandHandler("select", select_command))
-        app.add_handler(MessageHandler(filters.Document.ALL, handle_document))
-        app.add_handler(MessageHandler(filters.PHOTO, handle_photo))
-        app.add_handler(MessageHandler(filters.VIDEO, handle_video))
-        app.add_handler(MessageHandler(filters.AUDIO, handle_audio))
-        app.add_handler(MessageHandler(filters.VOICE, handle_voice))
-        app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
+        app.add_handler(CommandHandler("force", force_command))
+        app.add_handler(CommandHandler("profile", profile_command))
+        # 只处理私聊中的新消息：群组（包括目标群组）中的文件由群组观察器处理，不回复也不转发；
+        # 编辑过的消息和频道消息没有 update.message
+        app.add_handler(MessageHandler(
+            MEDIA_FILTER & filters.ChatType.PRIVATE & filters.UpdateType.MESSAGE, handle_media
+        ))
+        app.add_handler(MessageHandler(
+            filters.TEXT & ~filters.COMMAND & filters.ChatType.PRIVATE & filters.UpdateType.MESSAGE, handle_text
+        ))
+        
+        # 统计更新并分配关联ID：独立的处理器组，最先执行（同一更新的后续处理器共享上下文）
+        app.add_handler(TypeHandler(Update, begin_update), group=BEGIN_UPDATE_HANDLER_GROUP)
+        
+        # 群组观察器：独立的处理器组，先于其他处理器执行，只维护话题目录和统计
+        target_group = filters.Chat(chat_id=int(config.TARGET_GROUP_ID))
+        app.add_handler(
+            MessageHandler(
+                target_group & (
+                    filters.StatusUpdate.FORUM_TOPIC_CREATED
+                    | filters.StatusUpdate.FORUM_TOPIC_EDITED
+                    | filters.StatusUpdate.FORUM_TOPIC_CLOSED
+                    | filters.StatusUpdate.FORUM_TOPIC_REOPENED
+                ),
+                handle_forum_topic_update
+            ),
+            group=GROUP_OBSERVER_HANDLER_GROUP
+        )
+        app.add_handler(
+            MessageHandler(target_group & filters.IS_TOPIC_MESSAGE, observe_group_message),
+            group=GROUP_OBSERVER_HANDLER_GROUP
+        )
         
         # 添加错误处理器
         app.add_error_handler(error_handler)
@@ -465,11 +1262,16 @@ def main():
         
         # 启动机器人
         logger.info("正在启动 Telegram 文件上传机器人...")
-        app.run_polling(
-            drop_pending_updates=True, 
-            allowed_updates=Update.ALL_TYPES,
-            timeout=CONNECTION_TIMEOUT
-        )
+        if config.BOT_MODE == 'webhook':
+            # 与 run_polling 一样在默认事件循环中运行：导入时创建的队列、锁等在 Python 3.8/3.9 上绑定默认事件循环，
+            # asyncio.run 会新建事件循环导致 "attached to a different loop"
+            asyncio.get_event_loop().run_until_complete(run_webhook(app))
+        else:
+            app.run_polling(
+                drop_pending_updates=config.DROP_PENDING_UPDATES, 
+                allowed_updates=Update.ALL_TYPES,
+                timeout=CONNECTION_TIMEOUT
+            )
         
     except KeyboardInterrupt:
         logger.info("机器人已停止")
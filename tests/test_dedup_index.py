@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""去重索引与转发预占测试（通过 forward_job_to_destination 驱动）"""
+
+import asyncio
+import importlib
+from types import SimpleNamespace
+
+import pytest
+
+from dedup_index import DedupIndex
+from destinations import Destination
+from forward_queue import ForwardJob
+from media import FileInfo
+
+pytest.importorskip("telegram")
+from telegram.error import NetworkError  # noqa: E402
+
+CHAT_ID = -1001
+TOPIC_ID = 3
+DESTINATION = Destination(CHAT_ID, TOPIC_ID, "测试群组")
+RESULT = FileInfo('document', 'file-1', 'unique-1', 'a.pdf', 10, 'application/pdf', title='a')
+
+
+@pytest.fixture
+def bot_module(tmp_path, monkeypatch):
+    """导入机器人模块（日志写到临时目录），使用临时的去重索引，单次转发不做内部重试"""
+    monkeypatch.chdir(tmp_path)
+    module = importlib.import_module("start_ultra_stable")
+    index = DedupIndex(str(tmp_path / "dedup.db"))
+    index.open()
+    monkeypatch.setattr(module, "dedup_index", index)
+    monkeypatch.setattr(module, "api_breaker", module.CircuitBreaker(failure_threshold=100))
+    monkeypatch.setattr(module, "MAX_RETRIES", 1)
+    monkeypatch.setattr(module.config, "DEDUP_ENABLED", True)
+    yield module
+    index.close()
+
+
+class StubBot:
+    """按顺序执行预设动作的 send_document：'ok' 发送成功，'fail' 抛出 NetworkError，asyncio.Event 等待后成功"""
+
+    def __init__(self, *actions):
+        self.actions = list(actions)
+        self.sent = []
+
+    async def send_document(self, **params):
+        action = self.actions.pop(0)
+        if action == 'fail':
+            raise NetworkError("connection reset")
+        if isinstance(action, asyncio.Event):
+            await action.wait()
+        self.sent.append(params['document'])
+        return SimpleNamespace(message_id=100 + len(self.sent))
+
+
+def run(coro):
+    """运行测试场景；预占没有释放时等待的任务会一直挂起，超时视为失败"""
+    return asyncio.run(asyncio.wait_for(coro, 5))
+
+
+def make_job(force=False):
+    return ForwardJob(
+        result=RESULT, user=SimpleNamespace(id=1), file_type='文档', chat_id=1, message_id=1, force=force
+    )
+
+
+def test_retry_after_failure_sends_again(bot_module):
+    async def scenario():
+        bot = StubBot('fail', 'ok')
+        job = make_job()
+        with pytest.raises(NetworkError):
+            await bot_module.forward_job_to_destination(job, [RESULT], DESTINATION, bot)
+        assert bot_module.dedup_index.pending(CHAT_ID, TOPIC_ID, 'unique-1') is None
+
+        assert await bot_module.forward_job_to_destination(job, [RESULT], DESTINATION, bot) == {}
+        return bot.sent
+
+    assert run(scenario()) == ['file-1']
+
+
+def test_retry_after_success_is_skipped(bot_module):
+    async def scenario():
+        bot = StubBot('ok')
+        job = make_job()
+        assert await bot_module.forward_job_to_destination(job, [RESULT], DESTINATION, bot) == {}
+        assert await bot_module.forward_job_to_destination(job, [RESULT], DESTINATION, bot) == {0: 101}
+        return bot.sent
+
+    assert run(scenario()) == ['file-1']
+
+
+def test_failed_forced_send_keeps_other_reservation(bot_module):
+    async def scenario():
+        gate = asyncio.Event()
+        bot = StubBot(gate, 'fail')
+        sending = asyncio.ensure_future(bot_module.forward_job_to_destination(make_job(), [RESULT], DESTINATION, bot))
+        await asyncio.sleep(0)
+
+        # 强制重发不预占，失败后不能释放正在发送的任务的预占
+        with pytest.raises(NetworkError):
+            await bot_module.forward_job_to_destination(make_job(force=True), [RESULT], DESTINATION, bot)
+        waiting = asyncio.ensure_future(bot_module.forward_job_to_destination(make_job(), [RESULT], DESTINATION, bot))
+        await asyncio.sleep(0)
+        assert not waiting.done()
+
+        gate.set()
+        assert await sending == {}
+        assert await waiting == {0: 101}
+        return bot.sent
+
+    assert run(scenario()) == ['file-1']
+
+
+def test_reserve_unsent_reports_duplicates_without_reserving(tmp_path):
+    async def scenario():
+        index = DedupIndex(str(tmp_path / "dedup.db"))
+        index.open()
+        index.record(CHAT_ID, TOPIC_ID, 'f1', 42)
+        result = await index.reserve_unsent(CHAT_ID, TOPIC_ID, ['f1', 'f2'])
+        assert index.pending(CHAT_ID, TOPIC_ID, 'f1') is None
+        assert index.pending(CHAT_ID, TOPIC_ID, 'f2') is not None
+        return result
+
+    assert run(scenario()) == ([1], {0: 42})
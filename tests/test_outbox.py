@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""发件箱与启动重放测试"""
+
+import asyncio
+import importlib
+
+import pytest
+
+from outbox import Outbox
+from forward_queue import ForwardQueue
+from progress_reporter import ProgressReporter
+
+VALID_PAYLOAD = {
+    'result': {
+        'file_type': 'document', 'file_id': 'file-1', 'file_unique_id': 'unique-1',
+        'file_name': 'a.pdf', 'file_size': 10, 'mime_type': 'application/pdf'
+    },
+    'user_id': 1, 'file_type': '文档', 'chat_id': 1, 'message_id': 2
+}
+
+
+def open_outbox(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.db"))
+    outbox.open()
+    return outbox
+
+
+def status_of(outbox, job_id):
+    return outbox._conn.execute("SELECT status FROM forward_jobs WHERE id = ?", (job_id,)).fetchone()[0]
+
+
+def test_pending_skips_and_fails_undecodable_payloads(tmp_path):
+    outbox = open_outbox(tmp_path)
+    broken = outbox.add(1, 1, {})
+    outbox._conn.execute("UPDATE forward_jobs SET payload = ? WHERE id = ?", ("{not json", broken))
+    valid = outbox.add(1, 2, VALID_PAYLOAD)
+
+    assert outbox.pending() == [(valid, VALID_PAYLOAD)]
+    assert status_of(outbox, broken) == Outbox.STATUS_FAILED
+
+
+def test_replay_continues_after_incompatible_payload(tmp_path, monkeypatch):
+    pytest.importorskip("telegram")
+    monkeypatch.chdir(tmp_path)
+    module = importlib.import_module("start_ultra_stable")
+
+    outbox = open_outbox(tmp_path)
+    incompatible = outbox.add(1, 1, {'file_type': '文档', 'chat_id': 1, 'message_id': 1})
+    valid = outbox.add(1, 2, VALID_PAYLOAD)
+    queue = ForwardQueue()
+    monkeypatch.setattr(module, "outbox", outbox)
+    monkeypatch.setattr(module, "forward_queue", queue)
+    monkeypatch.setattr(module, "progress", ProgressReporter())
+
+    asyncio.run(module.replay_outbox())
+
+    assert queue.depth == 1
+    assert queue._queue.get_nowait().job_id == valid
+    assert status_of(outbox, incompatible) == Outbox.STATUS_FAILED
+    assert status_of(outbox, valid) == Outbox.STATUS_PENDING
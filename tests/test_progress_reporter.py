@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""进度汇报器发布状态消息测试"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("telegram")
+from telegram.error import BadRequest, TimedOut  # noqa: E402
+
+from progress_reporter import ProgressReporter  # noqa: E402
+
+
+class StubBot:
+    """edit_message_text 抛出预设的错误，记录 send_message 调用"""
+
+    def __init__(self, edit_error=None):
+        self.edit_error = edit_error
+        self.edits = []
+        self.sent = []
+
+    async def edit_message_text(self, **params):
+        if self.edit_error is not None:
+            raise self.edit_error
+        self.edits.append(params['text'])
+
+    async def send_message(self, **params):
+        self.sent.append(params['text'])
+        return SimpleNamespace(message_id=200 + len(self.sent))
+
+
+def publish(edit_error):
+    """对已有状态消息的会话发布一次新状态，返回 (是否成功, 机器人, 会话)"""
+    async def scenario():
+        bot = StubBot(edit_error)
+        reporter = ProgressReporter()
+        reporter.attach(bot)
+        session = reporter._session(1, 10)
+        session.status_message_id = 100
+        return await reporter._publish(session, "状态"), bot, session
+
+    return asyncio.run(scenario())
+
+
+def test_transient_edit_error_does_not_send_duplicate():
+    published, bot, session = publish(TimedOut())
+
+    assert not published
+    assert bot.sent == []
+    assert session.status_message_id == 100
+    assert session.last_text != "状态"
+
+
+def test_missing_status_message_is_sent_again():
+    published, bot, session = publish(BadRequest("Message to edit not found"))
+
+    assert published
+    assert bot.sent == ["状态"]
+    assert session.status_message_id == 201
+
+
+def test_not_modified_counts_as_published():
+    published, bot, session = publish(BadRequest("Message is not modified"))
+
+    assert published
+    assert bot.sent == []
+    assert session.last_text == "状态"
+
+
+def test_other_bad_request_is_retried_later():
+    published, bot, session = publish(BadRequest("Chat not found"))
+
+    assert not published
+    assert bot.sent == []
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""话题注册表写回测试"""
+
+import os
+import json
+import errno
+import asyncio
+
+import topic_registry
+from topic_registry import TopicRegistry
+
+
+def test_flush_replaces_file_atomically(tmp_path):
+    path = tmp_path / "detected_topics.json"
+    registry = TopicRegistry(str(path))
+    registry.update(3, name="ASMR")
+
+    asyncio.run(registry.flush())
+
+    assert json.loads(path.read_text(encoding="utf-8"))["3"]["name"] == "ASMR"
+    assert os.listdir(tmp_path) == ["detected_topics.json"]
+
+
+def test_flush_writes_in_place_when_file_is_bind_mounted(tmp_path, monkeypatch):
+    path = tmp_path / "detected_topics.json"
+    path.write_text("{}", encoding="utf-8")
+    registry = TopicRegistry(str(path))
+    registry.update(3, name="ASMR")
+
+    def replace_busy(src, dst):
+        raise OSError(errno.EBUSY, "Device or resource busy", dst)
+
+    monkeypatch.setattr(topic_registry.os, "replace", replace_busy)
+    asyncio.run(registry.flush())
+
+    assert json.loads(path.read_text(encoding="utf-8"))["3"]["name"] == "ASMR"
+    assert os.listdir(tmp_path) == ["detected_topics.json"]
+    assert not registry._dirty
+
+
+def test_flush_keeps_data_dirty_on_other_errors(tmp_path, monkeypatch):
+    path = tmp_path / "detected_topics.json"
+    registry = TopicRegistry(str(path))
+    registry.update(3, name="ASMR")
+
+    def replace_denied(src, dst):
+        raise OSError(errno.EACCES, "Permission denied", dst)
+
+    monkeypatch.setattr(topic_registry.os, "replace", replace_denied)
+    asyncio.run(registry.flush())
+
+    assert not path.exists()
+    assert os.listdir(tmp_path) == []
+    assert registry._dirty
+
+
+def test_name_known_after_service_message(tmp_path):
+    registry = TopicRegistry(str(tmp_path / "detected_topics.json"))
+    registry.observe(5, "2026-10-18T00:00:00")
+    assert not registry.name_known(5)
+
+    registry.update(5, name="新名称", name_source="edited")
+    assert registry.name_known(5)
+    assert "icon_color" not in registry.get(5)
+
+
+def test_name_known_for_legacy_topics_without_source(tmp_path):
+    path = tmp_path / "detected_topics.json"
+    path.write_text(json.dumps({
+        "3": {"name": "ASMR", "count": 2},
+        "4": {"name": "话题4", "count": 1}
+    }, ensure_ascii=False), encoding="utf-8")
+    registry = TopicRegistry(str(path))
+    registry.load()
+
+    assert registry.name_known(3)
+    assert not registry.name_known(4)
+    assert not registry.name_known(99)
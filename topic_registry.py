@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+话题注册表模块
+话题信息常驻内存，群组消息只修改内存并标记为脏，由后台任务定期批量写回 detected_topics.json（原子替换，文件被单独挂载时原地写入）
+话题名称、图标和关闭状态来自论坛服务消息（话题创建/编辑/关闭/重新打开）
+"""
+
+import os
+import json
+import errno
+import asyncio
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+
+
+class TopicRegistry:
+    """内存中的话题注册表（写回式持久化）"""
+
+    def __init__(self, path: str, flush_interval: float = 10.0):
+        """
+        初始化话题注册表
+
+        Args:
+            path: 话题数据文件路径
+            flush_interval: 脏数据写回磁盘的间隔（秒）
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self._topics: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        self._flush_task: Optional[asyncio.Task] = None
+        self._write_lock = asyncio.Lock()
+
+    def load(self) -> None:
+        """启动时从磁盘加载话题数据"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._topics = json.load(f)
+            logger.info(f"已加载 {len(self._topics)} 个话题: {self.path}")
+        except (OSError, ValueError) as e:
+            logger.warning(f"加载话题数据失败: {str(e)}")
+
+    def get(self, topic_id) -> Optional[Dict[str, Any]]:
+        """查询话题信息"""
+        return self._topics.get(str(topic_id))
+
+    def items(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """所有话题（按写入顺序）"""
+        return list(self._topics.items())
+
+    def __len__(self) -> int:
+        return len(self._topics)
+
+    def is_available(self, topic_id) -> bool:
+        """话题是否可以发送（已关闭或已删除的话题返回 False，未知话题视为可用）"""
+        topic = self._topics.get(str(topic_id))
+        return topic is None or not (topic.get("closed") or topic.get("deleted"))
+
+    def name_known(self, topic_id) -> bool:
+        """
+        话题名称是否已记录（来自论坛服务消息或已补全过）
+
+        名称来源记录在 name_source 中；旧版本的数据没有该字段，名称不是默认名称时同样视为已记录
+        """
+        topic = self._topics.get(str(topic_id))
+        if topic is None:
+            return False
+        return "name_source" in topic or topic.get("name") != self._default_name(topic_id)
+
+    @staticmethod
+    def _default_name(topic_id) -> str:
+        """尚未获知名称的话题使用的默认名称"""
+        return f"话题{topic_id}"
+
+    def _topic(self, topic_id) -> Dict[str, Any]:
+        """获取话题信息，不存在时创建"""
+        key = str(topic_id)
+        topic = self._topics.get(key)
+        if topic is None:
+            topic = self._topics[key] = {"name": self._default_name(key), "count": 0}
+        return topic
+
+    def observe(self, topic_id, seen_at: str) -> Dict[str, Any]:
+        """
+        记录话题中的一条消息（只修改内存）
+
+        Args:
+            topic_id: 话题ID
+            seen_at: 消息时间（ISO 格式）
+
+        Returns:
+            Dict: 更新后的话题信息
+        """
+        topic = self._topic(topic_id)
+        topic["count"] = topic.get("count", 0) + 1
+        topic["last_detected"] = seen_at
+        self._dirty = True
+        return topic
+
+    def update(self, topic_id, **fields) -> Dict[str, Any]:
+        """
+        更新话题目录信息（名称、图标、关闭/删除状态），值为 None 的字段不修改
+
+        Args:
+            topic_id: 话题ID
+            **fields: 要更新的字段
+
+        Returns:
+            Dict: 更新后的话题信息
+        """
+        topic = self._topic(topic_id)
+        changed = {k: v for k, v in fields.items() if v is not None and topic.get(k) != v}
+        if changed:
+            topic.update(changed)
+            self._dirty = True
+        return topic
+
+    async def start(self) -> None:
+        """启动定期写回任务"""
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """停止定期写回并写回剩余的脏数据"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.flush()
+
+    async def _flush_loop(self) -> None:
+        """按间隔写回脏数据"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """如有修改，将快照写入磁盘（在线程中执行，不阻塞事件循环）"""
+        async with self._write_lock:
+            if not self._dirty:
+                return
+            # 在事件循环中序列化快照，写盘期间的新修改留到下次写回
+            text = json.dumps(self._topics, ensure_ascii=False, indent=2)
+            self._dirty = False
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self._write_atomic, text)
+            except OSError as e:
+                self._dirty = True
+                logger.error(f"保存话题数据失败: {str(e)}")
+
+    def _write_atomic(self, text: str) -> None:
+        """写入临时文件后原子替换，避免写到一半的文件"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".topics-", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                # docker-compose 把 detected_topics.json 单独挂载进容器，不能替换挂载点（EBUSY/EXDEV）
+                if e.errno not in (errno.EBUSY, errno.EXDEV):
+                    raise
+                self._write_in_place(text)
+                os.unlink(tmp_path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _write_in_place(self, text: str) -> None:
+        """无法替换文件时原地覆盖写入并同步到磁盘（不是原子的，写入中途崩溃时文件可能不完整）"""
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分阶段计时模块
+每个更新分配一个关联ID（写入日志），被采样的更新记录流水线各阶段的耗时并汇总，
+未采样时计时器只做一次 ContextVar 读取
+"""
+
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from loguru import logger
+
+
+class Trace:
+    """一个更新（及其转发任务）的追踪信息"""
+
+    __slots__ = ('trace_id', 'started', 'stages', '_profiler')
+
+    def __init__(self, trace_id: str, profiler: Optional['Profiler'] = None):
+        """
+        Args:
+            trace_id: 关联ID
+            profiler: 采样时汇总耗时的分析器，None 表示不计时
+        """
+        self.trace_id = trace_id
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self._profiler = profiler
+
+    @property
+    def sampled(self) -> bool:
+        return self._profiler is not None
+
+    def record(self, stage: str, elapsed: float) -> None:
+        """记录一个阶段的耗时（同一阶段多次出现时累加）"""
+        self.stages[stage] = self.stages.get(stage, 0.0) + elapsed
+        self._profiler.record(stage, elapsed)
+
+    def summary(self) -> str:
+        """各阶段耗时，例如 process_file=1.2ms forward=350.0ms"""
+        total = (time.perf_counter() - self.started) * 1000
+        stages = ' '.join(f"{stage}={elapsed * 1000:.1f}ms" for stage, elapsed in self.stages.items())
+        return f"{stages} total={total:.1f}ms"
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar('trace', default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    """当前上下文的追踪信息"""
+    return _current.get()
+
+
+def activate(trace: Optional[Trace]):
+    """在当前上下文中启用追踪信息，返回用于恢复的 token"""
+    return _current.set(trace)
+
+
+def deactivate(token) -> None:
+    _current.reset(token)
+
+
+def correlation_id() -> str:
+    """当前上下文的关联ID，没有时返回 -"""
+    trace = _current.get()
+    return trace.trace_id if trace is not None else '-'
+
+
+class span:
+    """
+    阶段计时器，用法: with span('forward'): ...
+
+    只有当前更新被采样时才计时
+    """
+
+    __slots__ = ('stage', '_trace', '_started')
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self) -> 'span':
+        trace = _current.get()
+        self._trace = trace if trace is not None and trace.sampled else None
+        if self._trace is not None:
+            self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._trace is not None:
+            self._trace.record(self.stage, time.perf_counter() - self._started)
+
+
+class Profiler:
+    """采样分析器：每 N 个更新采样一个（或按需采样接下来的若干个），汇总各阶段耗时"""
+
+    def __init__(self, sample_every: int = 0):
+        """
+        Args:
+            sample_every: 每多少个更新采样一个，0 表示只在按需开启时采样
+        """
+        self.sample_every = max(0, sample_every)
+        self.samples = 0
+        self._seen = 0
+        self._forced = 0
+        # 阶段 -> [次数, 总耗时, 最大耗时]
+        self._stats: Dict[str, List[float]] = {}
+
+    def begin(self, trace_id: str) -> Trace:
+        """为新更新创建追踪信息并在当前上下文中启用，按采样规则决定是否计时"""
+        sampled = False
+        if self._forced:
+            self._forced -= 1
+            sampled = True
+        elif self.sample_every:
+            self._seen += 1
+            sampled = self._seen % self.sample_every == 0
+        if sampled:
+            self.samples += 1
+
+        trace = Trace(trace_id, self if sampled else None)
+        _current.set(trace)
+        return trace
+
+    def sample_next(self, count: int) -> None:
+        """采样接下来的 count 个更新"""
+        self._forced = max(0, count)
+
+    def record(self, stage: str, elapsed: float) -> None:
+        stats = self._stats.get(stage)
+        if stats is None:
+            stats = self._stats[stage] = [0, 0.0, 0.0]
+        stats[0] += 1
+        stats[1] += elapsed
+        if elapsed > stats[2]:
+            stats[2] = elapsed
+
+    def finish(self, trace: Optional[Trace]) -> None:
+        """采样的转发任务完成时输出各阶段耗时"""
+        if trace is not None and trace.sampled:
+            logger.info(f"阶段耗时: {trace.summary()}")
+
+    def reset(self) -> None:
+        self.samples = 0
+        self._stats.clear()
+
+    def report(self) -> str:
+        """各阶段耗时汇总（按总耗时降序）"""
+        if not self._stats:
+            return "暂无采样数据"
+        lines = [f"采样更新数: {self.samples}", "阶段: 次数 / 平均 / 最大 / 总计 (ms)"]
+        for stage, (count, total, peak) in sorted(self._stats.items(), key=lambda item: -item[1][1]):
+            lines.append(
+                f"{stage}: {count} / {total / count * 1000:.1f} / {peak * 1000:.1f} / {total * 1000:.1f}"
+            )
+        return '\n'.join(lines)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP 传输模块
+长轮询（getUpdates）和发送请求使用独立的连接池，超时、连接数、HTTP/2 和 keep-alive 分别配置
+"""
+
+from typing import Callable, Optional
+import httpx
+from telegram.request import HTTPXRequest
+
+
+class TunedHTTPXRequest(HTTPXRequest):
+    """在 HTTPXRequest 的基础上支持配置 keep-alive 连接数和空闲连接保留时间"""
+
+    __slots__ = ('_max_keepalive_connections', '_keepalive_expiry')
+
+    def __init__(
+        self,
+        *args,
+        max_keepalive_connections: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        **kwargs
+    ):
+        """
+        Args:
+            max_keepalive_connections: 保持的空闲连接数上限，None 表示与连接池大小相同
+            keepalive_expiry: 空闲连接保留时间（秒），None 使用 httpx 默认值
+            其余参数同 HTTPXRequest
+        """
+        # 父类构造时就会创建客户端，需要先设置
+        self._max_keepalive_connections = max_keepalive_connections
+        self._keepalive_expiry = keepalive_expiry
+        super().__init__(*args, **kwargs)
+
+    def _build_client(self) -> httpx.AsyncClient:
+        limits = self._client_kwargs["limits"]
+        self._client_kwargs["limits"] = httpx.Limits(
+            max_connections=limits.max_connections,
+            max_keepalive_connections=(
+                self._max_keepalive_connections
+                if self._max_keepalive_connections is not None
+                else limits.max_keepalive_connections
+            ),
+            keepalive_expiry=(
+                self._keepalive_expiry if self._keepalive_expiry is not None else limits.keepalive_expiry
+            )
+        )
+        return super()._build_client()
+
+
+class PollingHTTPXRequest(HTTPXRequest):
+    """长轮询传输：每次 getUpdates 成功返回后回调，用于健康检查记录最近一次成功轮询"""
+
+    __slots__ = ('_on_success',)
+
+    def __init__(self, *args, on_success: Optional[Callable[[], None]] = None, **kwargs):
+        """
+        Args:
+            on_success: getUpdates 返回 2xx 时调用
+            其余参数同 HTTPXRequest
+        """
+        self._on_success = on_success
+        super().__init__(*args, **kwargs)
+
+    async def do_request(self, *args, **kwargs):
+        code, payload = await super().do_request(*args, **kwargs)
+        if self._on_success is not None and 200 <= code < 300:
+            self._on_success()
+        return code, payload
+
+
+def build_send_request(config, pool_size: int) -> HTTPXRequest:
+    """
+    创建发送请求（send_*/copy_messages/编辑消息等）使用的传输
+
+    Args:
+        config: 配置对象
+        pool_size: 连接池大小（按并发发送数估算）
+    """
+    return TunedHTTPXRequest(
+        connection_pool_size=pool_size,
+        connect_timeout=config.SEND_CONNECT_TIMEOUT,
+        read_timeout=config.SEND_READ_TIMEOUT,
+        write_timeout=config.SEND_WRITE_TIMEOUT,
+        pool_timeout=config.SEND_POOL_TIMEOUT,
+        http_version="2" if config.SEND_HTTP2 else "1.1",
+        keepalive_expiry=config.SEND_KEEPALIVE_EXPIRY
+    )
+
+
+def build_polling_request(config, on_success: Optional[Callable[[], None]] = None) -> HTTPXRequest:
+    """
+    创建长轮询（getUpdates）使用的传输
+
+    getUpdates 同一时间只有一个请求，独立的单连接池保证它不会与媒体发送争抢连接。
+    PTB 会在读取超时上自动加上长轮询的 timeout
+
+    Args:
+        config: 配置对象
+        on_success: 每次轮询成功后调用
+    """
+    return PollingHTTPXRequest(
+        connection_pool_size=1,
+        connect_timeout=config.POLL_CONNECT_TIMEOUT,
+        read_timeout=config.POLL_READ_TIMEOUT,
+        write_timeout=config.POLL_CONNECT_TIMEOUT,
+        pool_timeout=config.POLL_CONNECT_TIMEOUT,
+        on_success=on_success
+    )
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+更新处理器模块
+并发处理不同聊天的更新，同一聊天（私聊即同一用户）的更新按到达顺序串行处理
+"""
+
+import asyncio
+from typing import Any, Awaitable, Dict, Hashable, List, Optional
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+class OrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    按聊天保序的并发更新处理器
+
+    PTB 在调用 do_process_update 之前就占用并发名额，如果直接用它限制并发，
+    同一聊天排队等待的更新会占满名额、阻塞其他聊天。因此基类名额放宽为积压上限，
+    真正的并发上限在拿到聊天锁之后再占用
+    """
+
+    __slots__ = ('concurrency', '_running', '_locks')
+
+    # 每个并发名额允许积压（等待聊天锁）的更新数
+    PENDING_PER_SLOT = 64
+
+    def __init__(self, max_concurrent_updates: int):
+        """
+        初始化更新处理器
+
+        Args:
+            max_concurrent_updates: 同时执行的处理器数量上限
+        """
+        super().__init__(max_concurrent_updates * self.PENDING_PER_SLOT)
+        self.concurrency = max_concurrent_updates
+        self._running = asyncio.BoundedSemaphore(max_concurrent_updates)
+        # 聊天 -> [锁, 持有或等待锁的更新数]
+        self._locks: Dict[Hashable, List[Any]] = {}
+
+    @staticmethod
+    def ordering_key(update: object) -> Optional[Hashable]:
+        """更新的保序键：聊天ID，没有聊天时使用用户ID，都没有则不保序"""
+        if not isinstance(update, Update):
+            return None
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+        if update.effective_user is not None:
+            return ('user', update.effective_user.id)
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        """同一聊天的更新依次执行，不同聊天的更新并发执行"""
+        key = self.ordering_key(update)
+        if key is None:
+            async with self._running:
+                await coroutine
+            return
+
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            # asyncio.Lock 按等待顺序唤醒，保证同一聊天内的到达顺序
+            async with entry[0]:
+                async with self._running:
+                    await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    async def initialize(self) -> None:
+        """无需初始化"""
+
+    async def shutdown(self) -> None:
+        """无需清理"""
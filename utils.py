@@ -6,32 +6,80 @@
 
 import os
 import sys
+import zlib
 from typing import List, Optional
 from datetime import datetime
 from loguru import logger
 from telegram import User
+from media import FileInfo
+from tracing import correlation_id
 
+# WARNING 级别的数值（loguru 内置级别）
+WARNING_LEVEL = logger.level("WARNING").no
 
-def setup_logging():
-    """设置日志配置"""
+
+# 高频日志（每个文件都会输出的 INFO 日志）使用的 logger，按关联ID采样
+sampled_logger = logger.bind(sampled=True)
+
+
+class LogSampler:
+    """
+    日志采样过滤器：sampled_logger 的日志每 N 个关联ID只输出其中 1 个，WARNING 及以上总是输出
+
+    按关联ID的哈希决定是否输出，被选中的更新保留从入队到转发的全部日志；
+    没有关联ID的日志（如重放的任务）全部输出
+    """
+
+    def __init__(self, every: int = 1):
+        """
+        Args:
+            every: 采样间隔，1 表示不采样
+        """
+        self.every = max(1, every)
+
+    def __call__(self, record) -> bool:
+        if self.every == 1 or not record["extra"].get("sampled") or record["level"].no >= WARNING_LEVEL:
+            return True
+        cid = record["extra"].get("cid", '-')
+        return cid == '-' or zlib.crc32(cid.encode()) % self.every == 0
+
+
+def setup_logging(level: str = "INFO", json_format: bool = False, enqueue: bool = True, sample_every: int = 1):
+    """
+    设置日志配置
+    
+    Args:
+        level: 控制台日志级别（文件始终记录 DEBUG）
+        json_format: 输出 JSON（每行一条，包含关联ID等附加字段），便于日志系统采集
+        enqueue: 日志经队列交给后台线程写入，格式化之后的写文件、轮转和压缩都不在事件循环中进行
+        sample_every: 控制台只输出每 N 个关联ID中 1 个的高频日志（文件始终完整记录）
+    """
     # 移除默认处理器
     logger.remove()
     
+    # 每条日志带上当前更新的关联ID，同一文件的日志可以串联起来
+    logger.configure(patcher=lambda record: record["extra"].update(cid=correlation_id()))
+    
     # 添加控制台输出
     logger.add(
         sys.stdout,
-        format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-        level="INFO"
+        format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | {extra[cid]} | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
+        level=level,
+        filter=LogSampler(sample_every),
+        serialize=json_format,
+        enqueue=enqueue
     )
     
     # 添加文件输出
     logger.add(
         "logs/bot.log",
-        format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
+        format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {extra[cid]} | {name}:{function}:{line} - {message}",
         level="DEBUG",
         rotation="10 MB",
         retention="7 days",
-        compression="zip"
+        compression="zip",
+        serialize=json_format,
+        enqueue=enqueue
     )
 
 
@@ -52,12 +100,26 @@ def is_user_allowed(user_id: int, allowed_users: List[str]) -> bool:
     return str(user_id) in allowed_users
 
 
-def format_file_info(result: dict, user: User, file_type: str) -> str:
+def is_user_admin(user_id: int, admin_users: List[str]) -> bool:
+    """
+    检查用户是否为管理员
+    
+    Args:
+        user_id: 用户ID
+        admin_users: 管理员用户ID列表
+        
+    Returns:
+        bool: 是否为管理员（列表为空时没有管理员）
+    """
+    return str(user_id) in admin_users
+
+
+def format_file_info(result: FileInfo, user: User, file_type: str) -> str:
     """
     格式化文件信息为消息文本
     
     Args:
-        result: 文件处理结果
+        result: 文件信息
         user: 用户对象
         file_type: 文件类型
         
@@ -66,7 +128,7 @@ def format_file_info(result: dict, user: User, file_type: str) -> str:
     """
     try:
         # 只返回文件名
-        file_name = result.get('file_name', '未知文件')
+        file_name = result.file_name or '未知文件'
         
         # 如果文件名包含扩展名，去掉扩展名
         if '.' in file_name:
@@ -77,7 +139,7 @@ def format_file_info(result: dict, user: User, file_type: str) -> str:
         
     except Exception as e:
         logger.error(f"格式化文件信息失败: {str(e)}")
-        return result.get('file_name', '未知文件')
+        return result.file_name or '未知文件'
 
 
 def format_file_size(size_bytes: int) -> str:
@@ -281,6 +343,24 @@ def extract_topic_id_from_message(message) -> Optional[int]:
         return None
 
 
+def build_message_link(chat_id: int, message_id: int) -> Optional[str]:
+    """
+    生成群组消息链接
+    
+    Args:
+        chat_id: 群组ID（超级群组以-100开头）
+        message_id: 消息ID
+        
+    Returns:
+        str: 消息链接，非超级群组返回None
+    """
+    chat_id_str = str(chat_id)
+    if not chat_id_str.startswith('-100'):
+        return None
+    
+    return f"https://t.me/c/{chat_id_str[4:]}/{message_id}"
+
+
 def get_group_info_from_link(link: str) -> dict:
     """
     从群组链接获取基本信息
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Webhook 服务器模块
+内嵌的 aiohttp 服务器：接收 Telegram 推送的更新（校验 secret token）并直接放入 Application 的更新队列，
+同一端口提供健康检查接口（/healthz、/readyz）和 Prometheus 指标（/metrics）
+"""
+
+import hmac
+from typing import Any, Callable, Dict, Optional
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+from loguru import logger
+from metrics import CONTENT_TYPE
+
+
+# Telegram 推送更新时携带 secret token 的请求头
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """内嵌 HTTP 服务器（webhook + 健康检查 + 指标）"""
+
+    def __init__(
+        self,
+        application: Application,
+        host: str = "0.0.0.0",
+        port: int = 8080,
+        webhook_path: Optional[str] = None,
+        secret_token: Optional[str] = None,
+        probes: Optional[Dict[str, Callable[[], Dict[str, Any]]]] = None,
+        metrics: Optional[Callable[[], str]] = None,
+        on_update: Optional[Callable[[], None]] = None
+    ):
+        """
+        初始化服务器
+
+        Args:
+            application: 接收更新的 Application
+            host: 监听地址
+            port: 监听端口
+            webhook_path: 接收更新的路径，None 表示不启用 webhook（只提供健康检查）
+            secret_token: 校验 Telegram 请求的 secret token
+            probes: 健康检查路径 -> 返回状态字典的函数，字典中 ok 为假时返回 503
+            metrics: 返回 Prometheus 文本格式指标的函数，None 表示不提供 /metrics
+            on_update: 每收到一个更新时调用
+        """
+        self.application = application
+        self.host = host
+        self.port = port
+        self.webhook_path = webhook_path
+        self.secret_token = secret_token
+        self.metrics = metrics
+        self.on_update = on_update
+        self._runner: Optional[web.AppRunner] = None
+
+        self.app = web.Application()
+        for path, probe in (probes or {}).items():
+            self.app.router.add_get(path, self._probe_handler(probe))
+        if metrics is not None:
+            self.app.router.add_get("/metrics", self._handle_metrics)
+        if webhook_path:
+            self.app.router.add_post(webhook_path, self._handle_update)
+
+    async def start(self) -> None:
+        """开始监听"""
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"HTTP 服务器已启动: {self.host}:{self.port}")
+
+    async def stop(self) -> None:
+        """停止监听"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle_update(self, request: web.Request) -> web.Response:
+        """接收 Telegram 推送的更新，入队后立即返回，处理在 Application 中异步进行"""
+        if self.secret_token and not hmac.compare_digest(
+            request.headers.get(SECRET_TOKEN_HEADER, ""), self.secret_token
+        ):
+            logger.warning(f"拒绝 secret token 不匹配的 webhook 请求: {request.remote}")
+            return web.Response(status=403)
+
+        try:
+            data = await request.json()
+            update = Update.de_json(data, self.application.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"无法解析 webhook 更新: {str(e)}")
+            return web.Response(status=400)
+
+        if update is None:
+            return web.Response(status=400)
+
+        if self.on_update is not None:
+            self.on_update()
+        await self.application.update_queue.put(update)
+        return web.Response()
+
+    @staticmethod
+    def _probe_handler(probe: Callable[[], Dict[str, Any]]):
+        """健康检查接口：返回状态字典，ok 为真时 200，否则 503"""
+        async def handle(request: web.Request) -> web.Response:
+            status = probe()
+            return web.json_response(status, status=200 if status.get('ok') else 503)
+        return handle
+
+    async def _handle_metrics(self, request: web.Request) -> web.Response:
+        """Prometheus 指标"""
+        return web.Response(body=self.metrics().encode(), headers={"Content-Type": CONTENT_TYPE})